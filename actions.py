@@ -0,0 +1,128 @@
+"""Compact action logs and the replays.dat file.
+
+Each successful move is one unsigned LEB128 varint of (arg << 3) | op:
+drops and the argument-free moves fit in one byte, a hammer on a 5x7
+board in at most two. Together with the game's spawn seed that is enough
+for replay.py to re-simulate the game exactly.
+
+replays.dat, like record.dat, is append-only after logfile.py's header:
+
+    replay   q score, q unix time, Q seed, B rows, B cols,
+             B spawn count (0 = SPAWN_VALUES), x,
+             I crc32 of the final board, I log length             36 bytes
+             spawn exponent bytes, log bytes,
+             then I crc32 and I length of everything above
+
+The trailing length lets append_replay find and check just the last
+entry, so saving a game costs the same however long the file is; only
+when that entry is torn does it walk the file to find the last whole one.
+Version 1 files, whose entries end with the CRC alone, are read as they
+are and rewritten as version 2 on their first append.
+"""
+import os
+import struct
+import zlib
+from collections import namedtuple
+
+from logfile import HEADER, open_append, read_file, write_file
+
+DROP, SWAP, HAMMER, UNDO, REDO = range(5)
+OP_NAMES = ("drop", "swap", "hammer", "undo", "redo")
+
+MAGIC = b"DM2048RP"
+VERSION = 2
+ENTRY = struct.Struct("<qqQBBBxII")
+TAIL = struct.Struct("<II")   # crc32, length of the entry before it
+TAILS = {1: struct.Struct("<I"), 2: TAIL}   # by file version
+
+Replay = namedtuple("Replay", "score ts seed rows cols board_crc actions spawn", defaults=((),))
+
+
+class ActionLog:
+    """Moves of one game as varint bytes."""
+    def __init__(self, data=b""):
+        self.data = bytearray(data)
+        self.moves = 0
+
+    def __len__(self): return self.moves
+
+    def add(self, op, arg=0):
+        v = arg << 3 | op
+        while v >= 0x80:
+            self.data.append(v & 0x7F | 0x80); v >>= 7
+        self.data.append(v)
+        self.moves += 1
+
+    def __bytes__(self): return bytes(self.data)
+
+
+def decode(data):
+    """Yield (op, arg) pairs from varint bytes."""
+    v = shift = 0
+    for b in data:
+        v |= (b & 0x7F) << shift
+        if b & 0x80: shift += 7; continue
+        yield v & 7, v >> 3
+        v = shift = 0
+
+
+def board_crc(board):
+    return zlib.crc32(bytes(v.bit_length()-1 if v else 0 for row in board for v in row))
+
+
+def pack_replay(rep):
+    """One replays.dat entry, trailer included."""
+    spawn = bytes(v.bit_length()-1 for v in rep.spawn)
+    entry = (ENTRY.pack(rep.score, rep.ts, rep.seed, rep.rows, rep.cols, len(spawn), rep.board_crc, len(rep.actions))
+             + spawn + bytes(rep.actions))
+    return entry + TAIL.pack(zlib.crc32(entry), len(entry))
+
+
+def append_replay(path, rep):
+    """Append one Replay to path, creating the file if needed."""
+    try: f = open_append(path, MAGIC, VERSION, "replay file", good_end=_good_end)
+    except ValueError:
+        reps = read_replays(path)   # Still a ValueError if it isn't a replay file at all
+        write_file(path, MAGIC, VERSION, b"".join(map(pack_replay, reps)))
+        f = open_append(path, MAGIC, VERSION, "replay file", good_end=_good_end)
+    with f:
+        f.write(pack_replay(rep))
+        f.flush(); os.fsync(f.fileno())
+
+
+def _scan(data, version=VERSION):
+    """Yield (offset, end, Replay or None for a bad CRC) for each whole entry."""
+    tail, o = TAILS[version], HEADER.size
+    while o + ENTRY.size <= len(data):
+        score, ts, seed, rows, cols, ns, bcrc, n = ENTRY.unpack_from(data, o)
+        log = o + ENTRY.size + ns
+        end = log + n + tail.size
+        if end > len(data): return
+        body = data[o:end - tail.size]
+        ok = tail.unpack_from(data, end - tail.size) == ((zlib.crc32(body), len(body)) if version > 1 else (zlib.crc32(body),))
+        spawn = tuple(1 << e for e in data[o+ENTRY.size:log])
+        yield o, end, Replay(score, ts, seed, rows, cols, bcrc, data[log:end-tail.size], spawn) if ok else None
+        o = end
+
+
+def _good_end(f, size):
+    """size if the file ends in a whole entry, checked from its trailer
+    alone; otherwise the end of the last whole entry."""
+    if size == HEADER.size: return size
+    if size >= HEADER.size + ENTRY.size + TAIL.size:
+        f.seek(size - TAIL.size)
+        crc, n = TAIL.unpack(f.read(TAIL.size))
+        if size - TAIL.size - n >= HEADER.size:
+            f.seek(size - TAIL.size - n)
+            if zlib.crc32(f.read(n)) == crc: return size
+    f.seek(0)
+    end = HEADER.size
+    for _, end, _ in _scan(f.read(size)): pass
+    return end
+
+
+def read_replays(path):
+    """Every Replay in path with a good CRC. Raises ValueError if path
+    isn't a replay file."""
+    version, data = read_file(path, MAGIC, tuple(TAILS), "replay file")
+    return [r for _, _, r in _scan(data, version) if r is not None]
@@ -0,0 +1,58 @@
+"""Image assets loaded once and kept in memory.
+
+Icons are decoded and scaled on first use (or up front with preload()),
+so the render loop never touches the disk. A missing file is remembered
+as missing and the caller draws its letter glyph instead. With watch on,
+poll() re-checks modification times at most once per interval and
+reloads files that changed or appeared, for editing icons while the game
+runs.
+"""
+import os
+import time
+
+import pygame
+
+
+class Assets:
+    def __init__(self, paths, watch=False, interval=1.0):
+        self.paths = paths
+        self.watch = watch
+        self.interval = interval
+        self.cache = {}   # (char, size) -> surface or None
+        self.mtimes = {}  # path -> mtime or None
+        self.last_poll = 0.0
+
+    def _mtime(self, path):
+        try: return os.path.getmtime(path)
+        except OSError: return None
+
+    def _load(self, char, size):
+        path = self.paths.get(char, "")
+        self.mtimes[path] = self._mtime(path)
+        if self.mtimes[path] is None: return None
+        try:
+            img = pygame.image.load(path).convert_alpha()
+            return pygame.transform.smoothscale(img, (size, size))
+        except (pygame.error, OSError): return None
+
+    def icon(self, char, size=40):
+        """(surface, None) when the image loaded, else (None, char)."""
+        key = (char, size)
+        if key not in self.cache: self.cache[key] = self._load(char, size)
+        img = self.cache[key]
+        return (img, None) if img is not None else (None, char)
+
+    def preload(self, size=40):
+        for char in self.paths: self.icon(char, size)
+
+    def poll(self):
+        """Reload changed files (watch mode only). True if anything reloaded."""
+        if not self.watch: return False
+        now = time.monotonic()
+        if now - self.last_poll < self.interval: return False
+        self.last_poll = now
+        stale = {p for p, m in self.mtimes.items() if self._mtime(p) != m}
+        if not stale: return False
+        for char, size in list(self.cache):
+            if self.paths.get(char, "") in stale: self.cache[(char, size)] = self._load(char, size)
+        return True
@@ -0,0 +1,231 @@
+"""NumPy simulator running N games in lockstep.
+
+Boards are a (N, rows, cols) uint8 array of exponents (0 = empty, e = tile
+2**e). Drops, merge passes and gravity are array operations over every
+live game at once; games that are over are masked out. Rules, scoring and
+the seeded spawn stream match engine.Engine(seed=...), so any game in a
+batch can be replayed move for move with the scalar engine.
+
+Throughput depends on N: with random columns it finishes about 700
+games/s at N=1000 and 1300 at N=10000 on one core, against about 380 for
+one scalar BitEngine (~3.5x). It runs in a single process, so beyond about
+four cores tournament.py (a BitEngine per core) plays more games per
+second; use it where one process is all there is. Label propagation is
+not the cap: most passes settle in two or three rounds. Small batches are
+no faster than the scalar engine.
+
+    b = BatchEngine(10000)
+    while not b.over.all():
+        b.drop(b.random_columns(rng))
+"""
+import numpy as np
+
+from engine import ROWS, COLS, SPAWN_VALUES, START_GEMS, GEM_TILE, GEM_BONUS, GOLDEN
+from groups import merge_scan
+
+SPAWN_EXPS = np.array([v.bit_length()-1 for v in SPAWN_VALUES], np.uint8)
+GEM_EXP = GEM_TILE.bit_length()-1
+
+
+def spawn_indices(seeds, n, k=len(SPAWN_VALUES)):
+    """Vectorised engine.spawn_index over uint64 arrays (wrapping math)."""
+    with np.errstate(over="ignore"):
+        z = seeds + (n + np.uint64(1)) * np.uint64(GOLDEN)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (z ^ (z >> np.uint64(31))) % np.uint64(k)
+
+
+def _edges(b):
+    """Equal occupied neighbour pairs: vertical (M, R-1, C), horizontal (M, R, C-1)."""
+    ev = (b[:, :-1] == b[:, 1:]) & (b[:, 1:] > 0)
+    eh = (b[:, :, :-1] == b[:, :, 1:]) & (b[:, :, 1:] > 0)
+    return ev, eh
+
+
+def _touching(a, v):
+    """Cells with a 4-neighbour in a equal to their own value in v."""
+    t = np.zeros(a.shape, bool)
+    t[:, :-1] |= a[:, 1:] == v[:, :-1]
+    t[:, 1:] |= a[:, :-1] == v[:, 1:]
+    t[:, :, :-1] |= a[:, :, 1:] == v[:, :, :-1]
+    t[:, :, 1:] |= a[:, :, :-1] == v[:, :, 1:]
+    return t
+
+
+class BatchEngine:
+    """N independent games sharing one set of arrays."""
+    def __init__(self, n, seeds=None, rows=ROWS, cols=COLS):
+        self.n, self.rows, self.cols = n, rows, cols
+        if seeds is None: seeds = np.arange(n)
+        self.seeds = np.asarray(seeds).astype(np.uint64)
+        r, c = np.indices((rows, cols))
+        self.scan_key = ((rows-1-r)*cols + c).astype(np.int32)
+        self.big = np.int32(rows*cols)
+        self.reset()
+
+    def reset(self):
+        n = self.n
+        self.board = np.zeros((n, self.rows, self.cols), np.uint8)
+        self.score = np.zeros(n, np.int64)
+        self.gems = np.full(n, START_GEMS, np.int64)
+        self.moves = np.zeros(n, np.int64)
+        self.over = np.zeros(n, bool)
+        self.draws = np.zeros(n, np.uint64)
+        everyone = np.ones(n, bool)
+        self.curr = self._rnd(everyone)
+        self.next = self._rnd(everyone)
+
+    def _rnd(self, mask):
+        out = np.zeros(self.n, np.uint8)
+        out[mask] = SPAWN_EXPS[spawn_indices(self.seeds[mask], self.draws[mask])]
+        self.draws[mask] += np.uint64(1)
+        return out
+
+    def values(self, i):
+        """Game i's board as the engine's list of tile values."""
+        b = self.board[i].astype(np.int64)
+        return np.where(b > 0, 1 << b, 0).tolist()
+
+    # --- actions ---
+
+    def legal(self):
+        """(N, cols) mask of columns that still have room."""
+        return (self.board[:, 0, :] == 0) & ~self.over[:, None]
+
+    def random_columns(self, rng):
+        """One random legal column per game (-1 where none)."""
+        legal = self.legal()
+        pick = np.where(legal, rng.random(legal.shape), -1.0)
+        cols = pick.argmax(1)
+        cols[~legal.any(1)] = -1
+        return cols
+
+    def drop(self, cols):
+        """Drop each game's current tile in cols[i] (-1 = pass) and resolve.
+
+        Returns the mask of games where the drop happened.
+        """
+        cols = np.asarray(cols)
+        idx = np.arange(self.n)
+        ok = ~self.over & (cols >= 0)
+        col = np.where(ok, cols, 0)
+        empty = self.board[idx, :, col] == 0
+        ok &= empty.any(1)
+        lr = self.rows-1 - empty[:, ::-1].argmax(1)
+        g = idx[ok]
+        self.board[g, lr[ok], col[ok]] = self.curr[ok]
+        self.curr = np.where(ok, self.next, self.curr)
+        self.next = np.where(ok, self._rnd(ok), self.next)
+        self.moves += ok
+        self.step(ok)
+        return ok
+
+    # --- resolution ---
+
+    def check_loss(self):
+        return (self.board[:, 0, :] != 0).all(1)
+
+    def step(self, live):
+        """Loss check, then merge/gravity passes until every game settles."""
+        lost = live & self.check_loss()
+        self.over |= lost
+        live = live & ~lost
+        while live.any():
+            live = self.check_merges(live)
+            self.apply_gravity(live)
+
+    def _spread(self, lab, ev, eh):
+        """Propagate the smallest label across equal edges, in place."""
+        big, total = self.big, lab.sum(dtype=np.int64)
+        while True:
+            np.minimum(lab[:, :-1], np.where(ev, lab[:, 1:], big), out=lab[:, :-1])
+            np.minimum(lab[:, 1:], np.where(ev, lab[:, :-1], big), out=lab[:, 1:])
+            np.minimum(lab[:, :, :-1], np.where(eh, lab[:, :, 1:], big), out=lab[:, :, :-1])
+            np.minimum(lab[:, :, 1:], np.where(eh, lab[:, :, :-1], big), out=lab[:, :, 1:])
+            total, last = lab.sum(dtype=np.int64), total   # Labels only shrink: same sum, no change
+            if total == last: return lab
+
+    def check_merges(self, mask):
+        """One merge pass over the masked games. Returns the games that merged.
+
+        Reproduces merge_scan's ordered scan without a per-game loop. Each
+        round labels equal-tile components with the smallest scan position
+        they contain, resolves the groups in scan order up to the first one
+        whose doubled anchor touches a tile of its new value (later groups
+        may then absorb it), and resumes after it next round. A group whose
+        lowest row holds several cells, none of them the start, needs the
+        scan's discovery order: that game finishes the pass with merge_scan.
+        """
+        out = np.zeros(self.n, bool)
+        g = np.flatnonzero(mask)
+        if not len(g): return out
+        R, C, big = self.rows, self.cols, self.big
+        key = self.scan_key
+        row_of = lambda k: R-1 - k//C
+        b = self.board[g]
+        ev, eh = _edges(b)
+        act = np.flatnonzero(ev.any((1, 2)) | eh.any((1, 2)))
+        vis = np.zeros(b.shape, bool)
+        ptr = np.zeros(len(g), np.int32)
+        gained = np.zeros(len(g), np.int64)
+        bonus = np.zeros(len(g), np.int64)
+        merged = np.zeros(len(g), bool)
+        while len(act):
+            ab, av = b[act], vis[act]
+            occ = ab > 0
+            ev, eh = _edges(ab)
+            grouped = np.zeros(ab.shape, bool)
+            grouped[:, :-1] |= ev; grouped[:, 1:] |= ev
+            grouped[:, :, :-1] |= eh; grouped[:, :, 1:] |= eh
+            elig = occ & ~av & (key >= ptr[act, None, None])
+            lab_s = self._spread(np.where(elig, key, big), ev, eh)
+            member = grouped & (lab_s < big)
+            if not member.any(): break
+            lab_a = self._spread(np.where(occ, key, big), ev, eh)
+            low = row_of(lab_s) == row_of(lab_a)
+            anchor = member & np.where(low, key == lab_s, key == lab_a)
+            amb = member & ~low & (row_of(key) == row_of(lab_a)) & (key != lab_a)
+            up = ab + 1
+            after = np.where(member, 0, ab)
+            after[anchor] = up[anchor]
+            clash = anchor & (_touching(ab, up) | _touching(after, up))
+            clash_k = np.where(clash, lab_s, big).min((1, 2))
+            amb_k = np.where(amb, lab_s, big).min((1, 2))
+            take = member & (lab_s <= clash_k[:, None, None]) & (lab_s < amb_k[:, None, None])
+            put = anchor & take
+            ab = np.where(take, 0, ab)
+            ab[put] = up[put]
+            b[act] = ab
+            vis[act] = av | take
+            gained[act] += np.where(put, np.left_shift(1, up.astype(np.int64)), 0).sum((1, 2))
+            bonus[act] += GEM_BONUS*(put & (up == GEM_EXP)).sum((1, 2))
+            merged[act] |= put.any((1, 2))
+            for j in np.flatnonzero((amb_k < big) & (amb_k <= clash_k)):
+                i = act[j]
+                b[i], gain, gem, hit = self._scan_one(b[i], amb_k[j], vis[i])
+                gained[i] += gain; bonus[i] += gem; merged[i] |= hit
+            go = clash_k < np.minimum(amb_k, big)
+            ptr[act[go]] = clash_k[go] + 1
+            act = act[go]
+        self.board[g] = b
+        self.score[g] += gained
+        self.gems[g] += bonus
+        out[g] = merged
+        return out
+
+    def _scan_one(self, b, start, vis):
+        board = np.where(b > 0, np.left_shift(1, b.astype(np.int64)), 0).tolist()
+        visited = set(zip(*map(np.ndarray.tolist, np.nonzero(vis))))
+        merges = merge_scan(board, self.rows, self.cols, int(start), visited)
+        exps = [[v.bit_length()-1 if v else 0 for v in row] for row in board]
+        gained = sum(m.new_val for m in merges)
+        bonus = GEM_BONUS*sum(m.new_val == GEM_TILE for m in merges)
+        return np.array(exps, np.uint8), gained, bonus, bool(merges)
+
+    def apply_gravity(self, mask):
+        g = np.flatnonzero(mask)
+        if not len(g): return
+        b = self.board[g]
+        order = np.argsort(b != 0, axis=1, kind="stable")
+        self.board[g] = np.take_along_axis(b, order, axis=1)
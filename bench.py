@@ -0,0 +1,329 @@
+"""Benchmarks for the hot paths, with JSON baselines.
+
+    python bench.py                   # run everything, compare with bench_baseline.json
+    python bench.py --save            # ... and make this run the new baseline
+    python bench.py -k render -k scan # only cases whose name contains one of these
+    python bench.py --threshold 0.5   # fail only past a 50% slowdown
+
+Each case is timed like timeit.autorange: calls are batched until a batch
+takes BATCH_S, and the best of several batches is kept as seconds per
+call. Exits 1 if any case is slower than its baseline by more than the
+threshold. Rendering runs under SDL's dummy video driver in a scratch
+directory, so no window opens and the score files are left alone.
+Baselines are per machine: save one on the hardware you care about.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from engine import Engine, gravity, ROWS, COLS, SPAWN_VALUES
+from groups import MergeDetector, bfs_group, merge_scan
+from bitboard import BitEngine, layout, merge_pass, pack, settle
+
+BASELINE = "bench_baseline.json"
+BATCH_S = 0.05
+REPEATS = 5
+CASES = {}   # name -> setup() returning the callable to time
+
+
+def case(name):
+    def reg(setup):
+        CASES[name] = setup
+        return setup
+    return reg
+
+
+def timeit(fn, repeats=REPEATS):
+    """Best seconds per call of fn."""
+    n = 1
+    while True:
+        t = time.perf_counter()
+        for _ in range(n): fn()
+        dt = time.perf_counter() - t
+        if dt >= BATCH_S: break
+        n *= 2 if dt*4 >= BATCH_S else 10
+    best = dt/n
+    for _ in range(repeats-1):
+        t = time.perf_counter()
+        for _ in range(n): fn()
+        best = min(best, (time.perf_counter()-t)/n)
+    return best
+
+
+# --- boards ---
+
+def full_board(seed=1):
+    r = random.Random(seed)
+    return [[r.choice(SPAWN_VALUES) for _ in range(COLS)] for _ in range(ROWS)]
+
+
+def checkerboard():
+    """Full and no two neighbours equal: every cell is scanned, none merge."""
+    return [[(2, 4)[(r+c) % 2] for c in range(COLS)] for r in range(ROWS)]
+
+
+def giant_group():
+    return [[2]*COLS for _ in range(ROWS)]
+
+
+def cascade_board():
+    """Column 0 holds 64..2 bottom up, so dropping a 2 on it chains six waves."""
+    b = [[0]*COLS for _ in range(ROWS)]
+    for i, v in enumerate((64, 32, 16, 8, 4, 2)): b[ROWS-1-i][0] = v
+    return b
+
+
+def holes_board():
+    """Every other row empty: gravity moves half the board."""
+    b = checkerboard()
+    for r in range(0, ROWS, 2): b[r] = [0]*COLS
+    return b
+
+
+BOARDS = {"full": full_board, "checker": checkerboard, "giant": giant_group}
+
+
+# --- logic ---
+
+for _name, _make in BOARDS.items():
+    @case(f"merge_scan/{_name}")
+    def _(make=_make):
+        src = make()
+        return lambda: merge_scan([row[:] for row in src], ROWS, COLS)
+
+    @case(f"check_merges/{_name}")
+    def _(make=_make):
+        src = make()
+        det = MergeDetector(ROWS, COLS, incremental=False)
+        def run():
+            det.touch_all()
+            det.scan([row[:] for row in src])
+        return run
+
+    @case(f"bit_merge_pass/{_name}")
+    def _(make=_make):
+        bits, L = pack(make()), layout()
+        return lambda: merge_pass(bits, L)
+
+
+@case("bfs_group/giant")
+def _():
+    b = giant_group()
+    return lambda: bfs_group(b, ROWS-1, 0, 2, ROWS, COLS)
+
+
+@case("apply_gravity/holes")
+def _():
+    src = holes_board()
+    return lambda: gravity([row[:] for row in src], ROWS, COLS)
+
+
+@case("bit_settle/holes")
+def _():
+    bits, L = pack(holes_board()), layout()
+    return lambda: settle(bits, L)
+
+
+def _cascade(cls):
+    src = cascade_board()
+    g = cls(seed=0)
+    def run():
+        g.board = [row[:] for row in src]
+        g.detect.touch_all(); g.curr = 2
+        g.drop(0); g.step()
+    return run
+
+
+case("cascade/engine")(lambda: _cascade(Engine))
+case("cascade/bitboard")(lambda: _cascade(BitEngine))
+
+
+def _games(cls, n=20):
+    def run():
+        for s in range(n):
+            g, r = cls(seed=s), random.Random(s)
+            while not g.over:
+                if g.drop(r.randrange(COLS)) >= 0: g.step()
+                elif all(g.landing_row(c) < 0 for c in range(COLS)): break
+    return run
+
+
+case("games/engine_x20")(lambda: _games(Engine))
+case("games/bitboard_x20")(lambda: _games(BitEngine))
+
+
+@case("games/engine_128x64_x200")
+def _():
+    """200 drops on a big board: merges and gravity only visit what moved."""
+    def run():
+        g, r = Engine(128, 64, seed=0), random.Random(0)
+        for _ in range(200):
+            if g.drop(r.randrange(64)) >= 0: g.step()
+    return run
+
+
+@case("games/batch_x1000")
+def _():
+    import numpy as np
+    from batch import BatchEngine
+    def run():
+        b, rng = BatchEngine(1000), np.random.default_rng(0)
+        while not b.over.all():
+            if not b.drop(b.random_columns(rng)).any(): break
+    return run
+
+
+@case("hint/depth2")
+def _():
+    from hint import Searcher
+    g = BitEngine(seed=1)
+    for i in range(8): g.drop(i % COLS); g.step()
+    def run():
+        s = Searcher()
+        s.best(g.bits, g.curr, g.next, g.gems, 2)
+    return run
+
+
+# --- rendering ---
+
+_GUI = None
+
+
+def gui():
+    """The game module with a dummy display and a game in a scratch dir,
+    set to the same mid-game position for every case."""
+    global _GUI
+    if _GUI is None:
+        import pygame
+        import drop_merge_2048 as M
+        pygame.init()
+        M.screen = pygame.display.set_mode((M.WIDTH, M.HEIGHT))
+        M.clock = pygame.time.Clock()
+        cwd = os.getcwd()
+        os.chdir(tempfile.mkdtemp(prefix="dm2048-bench-"))
+        try: M.G = M.GamePro(); M.G.hist_mgr   # History opens lazily; keep it in the scratch dir
+        finally: os.chdir(cwd)
+        _GUI = M
+    G = _GUI.G
+    G.board = full_board(3)
+    G.board[0] = [0]*COLS
+    G.detect.touch_all(); G.gen += 1
+    G.fx.particles.clear(); G.fx.texts.clear()
+    return _GUI
+
+
+@case("gui/action_drop_cascade")
+def _():
+    M = gui()
+    src, G = cascade_board(), M.G
+    def run():
+        G.board = [row[:] for row in src]
+        G.detect.touch_all(); G.curr = 2
+        G.action_drop(0)
+        G.settle()   # Every animation frame of the fall and the six waves
+        G.fx.particles.clear(); G.fx.texts.clear()
+    return run
+
+
+@case("render/draw_ui")
+def _():
+    M = gui()
+    return lambda: M.draw_ui()
+
+
+@case("render/layered_full")
+def _():
+    M = gui()
+    R = M.LayeredRenderer()
+    def run():
+        R.invalidate(); M.tilemap().reset()
+        R.frame()
+    return run
+
+
+@case("render/layered_idle")
+def _():
+    M = gui()
+    R = M.LayeredRenderer()
+    R.frame()
+    return R.frame
+
+
+@case("render/layered_particles")
+def _():
+    M = gui()
+    R = M.LayeredRenderer()
+    fx = M.G.fx
+    def run():
+        if len(fx.particles) < 200:
+            fx.particles.emit(M.WIDTH//2, M.HEIGHT//2, (255, 200, 50), 300)
+        fx.step()
+        R.frame(0.5)
+    return run
+
+
+def run(names):
+    out = {}
+    for name in names:
+        out[name] = timeit(CASES[name]())
+        print(f"{name:28} {fmt(out[name])}", flush=True)
+    return out
+
+
+def fmt(s):
+    for unit, k in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if s*k >= 1: return f"{s*k:8.2f} {unit}"
+    return f"{s*1e9:8.0f} ns"
+
+
+def compare(results, baseline, threshold):
+    """Names of cases slower than baseline by more than threshold."""
+    bad = []
+    print()
+    for name, t in results.items():
+        if name not in baseline: continue
+        ratio = t / baseline[name]
+        flag = "REGRESSED" if ratio > 1 + threshold else ""
+        print(f"{name:28} {ratio:6.2f}x baseline {flag}")
+        if flag: bad.append(name)
+    return bad
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Drop Merge 2048 benchmarks")
+    ap.add_argument("-k", action="append", default=[], metavar="SUBSTR", help="only cases containing SUBSTR")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save", action="store_true", help="write the results as the baseline")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    ap.add_argument("--list", action="store_true")
+    args = ap.parse_args(argv)
+    names = [n for n in CASES if not args.k or any(k in n for k in args.k)]
+    if args.list:
+        print("\n".join(names)); return 0
+    results = run(names)
+    if {"games/engine_x20", "games/batch_x1000"} <= results.keys():
+        e, b = results["games/engine_x20"]/20, results["games/batch_x1000"]/1000
+        print(f"batch: {1/b:.0f} games/s at N=1000 vs {1/e:.0f} for Engine ({e/b:.1f}x; ~3.5x over BitEngine at N=10000, one process)")
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f: baseline = json.load(f)["results"]
+    bad = compare(results, baseline, args.threshold) if baseline else []
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": sys.version.split()[0], "time": time.strftime("%Y-%m-%d %H:%M"),
+                       "results": {**baseline, **results}}, f, indent=1, sort_keys=True)
+        print(f"saved {args.baseline}")
+    if bad: print(f"\n{len(bad)} regressed past {args.threshold:.0%}: {', '.join(bad)}")
+    return 1 if bad and not args.save else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
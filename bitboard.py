@@ -0,0 +1,288 @@
+"""Packed bitboard backend for the engine.
+
+Each cell is a 4-bit exponent (0 = empty, e = tile 2**e) and the whole
+board is one int laid out column-major: nibble i = c*rows + (rows-1-r), so
+column c is the slice of 4*rows bits starting at 4*rows*c with its bottom
+cell in the lowest nibble. Adjacent-equal detection and group flood fills
+are shifts and masks over the whole board; gravity compacts each column
+through a 16-bit lookup table.
+
+BitEngine is a drop-in Engine with identical rules and scoring.
+"""
+from functools import lru_cache
+
+from engine import Engine, ROWS, COLS, GEM_TILE, GEM_BONUS, HAMMER_COST, UNDO_DEPTH, SPAWN_VALUES
+from undo import Snapshot
+from actions import DROP, HAMMER
+from groups import Merge
+
+MAX_EXP = 15
+
+_COMPACT = None
+
+
+def _compact_table():
+    """COMPACT[x] = (x's non-empty nibbles packed low, their count)."""
+    global _COMPACT
+    if _COMPACT is None:
+        tab = []
+        for x in range(1 << 16):
+            out = n = 0
+            for s in range(0, 16, 4):
+                v = (x >> s) & 15
+                if v: out |= v << 4*n; n += 1
+            tab.append((out, n))
+        _COMPACT = tab
+    return _COMPACT
+
+
+class Layout:
+    """Masks for one board shape. Cell flags live in each nibble's low bit."""
+    def __init__(self, rows, cols):
+        self.rows, self.cols = rows, cols
+        self.cells = rows*cols
+        self.col_bits = 4*rows
+        self.col_mask = (1 << self.col_bits) - 1
+        self.ones = int("1"*self.cells, 16)
+        col_ones = int("1"*rows, 16)
+        # Cells with a neighbour above (not the top row) / to the right
+        self.vmask = 0
+        for c in range(cols):
+            self.vmask |= (col_ones >> 4) << self.col_bits*c
+        self.hmask = int("1"*(rows*(cols-1)), 16) if cols > 1 else 0
+        # Flags of scan row j (j = rows-1-r, bottom row first)
+        self.row = [sum(1 << 4*(c*rows + j) for c in range(cols)) for j in range(rows)]
+        self.rows_after = [sum(self.row[j+1:]) for j in range(rows)]
+        self.top = self.row[rows-1]
+        self.col_ones = col_ones
+
+    def nz(self, x):
+        return (x | x >> 1 | x >> 2 | x >> 3) & self.ones
+
+    def cell(self, r, c):
+        return 4*(c*self.rows + self.rows-1-r)
+
+    def after(self, flag):
+        """Flags of the cells scanned after flag's cell."""
+        j = ((flag.bit_length()-1) >> 2) % self.rows
+        return self.rows_after[j] | (self.row[j] & ~((flag << 1) - 1))
+
+    def pos(self, bit):
+        """(r, c) of a flag bit."""
+        i = (bit.bit_length()-1) >> 2
+        return self.rows-1 - i % self.rows, i // self.rows
+
+
+@lru_cache(maxsize=None)
+def layout(rows=ROWS, cols=COLS):
+    return Layout(rows, cols)
+
+
+def pack(board, rows=ROWS, cols=COLS):
+    L = layout(rows, cols)
+    bits = 0
+    for r in range(rows):
+        for c in range(cols):
+            v = board[r][c]
+            if v:
+                e = v.bit_length()-1
+                if e > MAX_EXP: raise OverflowError(f"tile {v} does not fit in 4 bits")
+                bits |= e << L.cell(r, c)
+    return bits
+
+
+def unpack(bits, rows=ROWS, cols=COLS):
+    board = [[0]*cols for _ in range(rows)]
+    for c in range(cols):
+        col = bits >> 4*rows*c
+        for r in range(rows-1, -1, -1):
+            e = col & 15
+            if e: board[r][c] = 1 << e
+            col >>= 4
+    return board
+
+
+def equal_pairs(bits, L):
+    """Flags of cells equal to the cell above (v) / to the right (h)."""
+    occ = L.nz(bits)
+    v = L.ones & ~L.nz(bits ^ (bits >> 4)) & occ & L.vmask
+    h = L.ones & ~L.nz(bits ^ (bits >> L.col_bits)) & occ & L.hmask
+    return v, h
+
+
+def has_merge(bits, L):
+    v, h = equal_pairs(bits, L)
+    return bool(v or h)
+
+
+def flood(seed, same, L):
+    """Grow flag set seed through 4-neighbours inside flag set same."""
+    g = seed
+    while True:
+        n = g | ((g & L.vmask) << 4) | ((g >> 4) & L.vmask) | ((g & L.hmask) << L.col_bits) | (g >> L.col_bits)
+        n &= same
+        if n == g: return g
+        g = n
+
+
+def first_in_scan(flags, L):
+    """Lowest-bit flag of the earliest scan row holding any of flags."""
+    for m in L.row:
+        m &= flags
+        if m: return m & -m
+    return 0
+
+
+def _cells(flags, L):
+    out = []
+    while flags:
+        b = flags & -flags
+        out.append(L.pos(b))
+        flags ^= b
+    return out
+
+
+def _near(flags, L):
+    return ((flags & L.vmask) << 4) | ((flags >> 4) & L.vmask) | ((flags & L.hmask) << L.col_bits) | (flags >> L.col_bits)
+
+
+def _first_found(start, grp, low, L):
+    """First flag of low that groups.bfs_group, run from start inside grp,
+    would discover: same stack order (right, left, down, up)."""
+    below = L.vmask << 4
+    stack, seen = [start], 0
+    while stack:
+        b = stack.pop()
+        if seen & b: continue
+        if b & low: return b
+        seen |= b
+        for n in (b << L.col_bits, b >> L.col_bits, (b & below) >> 4, (b & L.vmask) << 4):
+            if n & grp: stack.append(n)
+    return start
+
+
+def merge_pass(bits, L, cells=True):
+    """One merge pass, same result as groups.merge_scan. Returns (bits, merges).
+
+    Groups are resolved in scan order, and normally a group's first scanned
+    cell is in its lowest row and keeps the tile. A doubled anchor that
+    comes to touch tiles of its new value (a clash) breaks that: the scan
+    may pull it into a later group, which collapses into its lowest row in
+    bfs_group's discovery order, and the clash can make new pairs to scan.
+    So after a clash the candidates are recomputed past the scan position
+    and anchors are found with _first_found. With cells=False merges carry
+    only the values (cells and anchor None), which is all scoring needs.
+    """
+    v, h = equal_pairs(bits, L)
+    cand = v | (v << 4) | h | (h << L.col_bits)
+    merges = []
+    done = 0
+    clashed = False
+    while cand:
+        start = first_in_scan(cand, L)
+        e = (bits >> (start.bit_length()-1)) & 15
+        grp = flood(start, L.ones & ~L.nz(bits ^ (e*L.ones)), L)
+        if e >= MAX_EXP: raise OverflowError("merged tile does not fit in 4 bits")
+        anchor = start
+        if clashed:
+            low = first_in_scan(grp, L)
+            low = next(m & grp for m in L.row if m & low)
+            if not low & start: anchor = _first_found(start, grp, low, L)
+        done |= grp
+        bits = bits & ~(grp*15) | (e+1)*anchor
+        merges.append(Merge(_cells(grp, L), L.pos(anchor), 1 << e, 2 << e) if cells else Merge(None, None, 1 << e, 2 << e))
+        if _near(anchor, L) & ~L.nz(bits ^ ((e+1)*L.ones)):
+            clashed = True
+            v, h = equal_pairs(bits, L)
+            cand = (v | (v << 4) | h | (h << L.col_bits)) & ~done & L.after(start)
+        else: cand &= ~grp
+    return bits, merges
+
+
+def settle(bits, L):
+    """Apply gravity to every column. Returns (bits, moved)."""
+    occ = L.nz(bits)
+    holes = L.ones & ~occ
+    if not ((holes & L.vmask) << 4) & occ: return bits, False
+    tab = _compact_table()
+    out = 0
+    for c in range(L.cols):
+        sh = L.col_bits*c
+        col = (bits >> sh) & L.col_mask
+        res = n = 0
+        for s in range(0, L.col_bits, 16):
+            x, k = tab[(col >> s) & 0xFFFF]
+            res |= x << 4*n; n += k
+        out |= res << sh
+    return out, True
+
+
+class BitEngine(Engine):
+    """Engine on a packed int board. `board` unpacks a copy for display.
+
+    Merges in step() waves carry cells and anchor only with cells=True.
+    """
+    def __init__(self, rows=ROWS, cols=COLS, rng=None, seed=None, undo_depth=UNDO_DEPTH, spawn=SPAWN_VALUES,
+                 cells=False):
+        self.L = layout(rows, cols)
+        self.cells = cells
+        super().__init__(rows, cols, rng, seed=seed, undo_depth=undo_depth, spawn=spawn)
+
+    @property
+    def board(self): return unpack(self.bits, self.rows, self.cols)
+
+    @board.setter
+    def board(self, b):
+        self.bits = b if isinstance(b, int) else pack(b, self.rows, self.cols)
+
+    def snapshot(self): return Snapshot(self.bits, self.score, self.gems, self.curr, self.next)
+
+    def restore(self, st):
+        self.bits = st.board
+        self.score, self.gems, self.curr, self.next = st.score, st.gems, st.curr, st.next
+
+    def landing_row(self, col):
+        self.check_cell(0, col)
+        L = self.L
+        free = L.col_ones & ~L.nz((self.bits >> L.col_bits*col) & L.col_mask)
+        if not free: return -1
+        return self.rows-1 - ((free & -free).bit_length()-1)//4
+
+    def drop(self, col):
+        self.check_cell(0, col)
+        if self.over: return -1
+        lr = self.landing_row(col)
+        if lr == -1: return -1
+        e = self.curr.bit_length()-1
+        if e > MAX_EXP: raise OverflowError(f"tile {self.curr} does not fit in 4 bits")
+        self.save_state()
+        self.bits |= e << self.L.cell(lr, col)
+        self.curr = self.next
+        self.next = self.rnd()
+        self.log.add(DROP, col)
+        return lr
+
+    def hammer(self, r, c):
+        self.check_cell(r, c)
+        sh = self.L.cell(r, c)
+        if self.gems < HAMMER_COST or not (self.bits >> sh) & 15: return False
+        self.save_state()
+        self.gems -= HAMMER_COST
+        self.bits &= ~(15 << sh)
+        self.apply_gravity()
+        self.log.add(HAMMER, r*self.cols + c)
+        return True
+
+    def check_merges(self):
+        self.bits, merges = merge_pass(self.bits, self.L, self.cells)
+        for m in merges:
+            self.score += m.new_val
+            if m.new_val == GEM_TILE: self.gems += GEM_BONUS
+        return merges
+
+    def apply_gravity(self):
+        self.bits, moved = settle(self.bits, self.L)
+        return moved
+
+    def check_loss(self):
+        return self.L.nz(self.bits) & self.L.top == self.L.top
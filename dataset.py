@@ -0,0 +1,261 @@
+"""Training data: every position of a game with its move and outcome.
+
+    python dataset.py sim -n 100000 -s greedy -o positions.ds   # bot games, all cores
+    python dataset.py replays replays.dat -o positions.ds       # recorded human games
+    python dataset.py info positions.ds
+
+A dataset file is a header and then fixed-width records, so it can be
+memory-mapped and sliced without parsing:
+
+    header   8s magic, H version, 2x, I header length, then JSON with rows,
+             cols and the record dtype, space-padded to a multiple of 64
+    record   B source (0 human, 1 bot), Q seed, I move number, board,
+             B curr, B next, i gems before, B op, H arg, q score before,
+             i score delta, q final score
+
+The board is the BitEngine int as little-endian bytes (4-bit exponents,
+column-major, bottom cell first); boards() turns records into (N, rows,
+cols) exponent arrays. op/arg are as in actions.py: a drop's column, a
+hammer's r*cols + c. delta includes the whole cascade; final is the
+game's score when it ended. Bot runs number their seeds from --seed, so
+runs appended to one file over the same seeds repeat them. Writers buffer a game and append it under an
+exclusive file lock, so any number of processes can add to one file.
+
+    data, meta = open_dataset("positions.ds")   # numpy memmap, no copy
+    x, y = boards(data, meta["rows"], meta["cols"]), data["arg"]
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import time
+from contextlib import contextmanager
+from multiprocessing import Pool
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+from actions import DROP, SWAP, decode, read_replays
+from bitboard import BitEngine
+from engine import ROWS, COLS, SPAWN_VALUES
+from logfile import whole
+from replay import apply
+
+MAGIC = b"DM2048DS"
+VERSION = 1
+PREFIX = struct.Struct("<8sH2xI")
+ALIGN = 64
+HUMAN, BOT = range(2)   # record sources
+
+
+def record_dtype(rows=ROWS, cols=COLS):
+    return np.dtype([("source", "u1"), ("seed", "<u8"), ("move", "<u4"), ("board", "u1", ((rows*cols*4 + 7) // 8,)),
+                     ("curr", "u1"), ("next", "u1"), ("gems", "<i4"), ("op", "u1"), ("arg", "<u2"),
+                     ("score", "<i8"), ("delta", "<i4"), ("final", "<i8")])
+
+
+def header(rows, cols):
+    meta = json.dumps({"rows": rows, "cols": cols, "board": "bitboard int, little-endian",
+                       "dtype": record_dtype(rows, cols).descr}).encode()
+    size = -(-(PREFIX.size + len(meta)) // ALIGN) * ALIGN
+    return PREFIX.pack(MAGIC, VERSION, size) + meta.ljust(size - PREFIX.size)
+
+
+def read_header(f):
+    """(header length, meta dict with a numpy "dtype") of an open dataset."""
+    magic, version, size = PREFIX.unpack(f.read(PREFIX.size))
+    if (magic, version) != (MAGIC, VERSION): raise ValueError("not a dataset file")
+    meta = json.loads(f.read(size - PREFIX.size))
+    meta["dtype"] = np.dtype([tuple(tuple(x) if isinstance(x, list) else x for x in d) for d in meta["dtype"]])
+    return size, meta
+
+
+@contextmanager
+def _locked(f):
+    """Exclusive lock on f across processes."""
+    if fcntl:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try: yield
+        finally: fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0); msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try: yield
+        finally: f.seek(0); msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class Writer:
+    """Appends whole games to a dataset, creating it if needed."""
+    def __init__(self, path, rows=ROWS, cols=COLS):
+        self.f = open(path, "a+b")
+        with _locked(self.f):
+            if os.path.getsize(path) == 0: self.f.write(header(rows, cols)); self.f.flush()
+            self.f.seek(0)
+            self.start, meta = read_header(self.f)
+        if (meta["rows"], meta["cols"]) != (rows, cols):
+            raise ValueError(f"{path} holds {meta['rows']}x{meta['cols']} boards, not {rows}x{cols}")
+        self.dtype = meta["dtype"]
+
+    def write(self, records):
+        with _locked(self.f):
+            size = self.f.seek(0, os.SEEK_END)
+            good = whole(size, self.start, self.dtype.itemsize)
+            if good != size: self.f.truncate(good)   # Drop a torn final record
+            self.f.write(records.tobytes())
+            self.f.flush()
+
+    def close(self): self.f.close()
+
+
+class Recorder:
+    """Positions of one BitEngine game, kept until its final score is known."""
+    def __init__(self, g, source):
+        self.g, self.source = g, source
+        self.nbytes = record_dtype(g.rows, g.cols)["board"].shape[0]
+        self.boards, self.rows = [], []
+
+    def state(self):
+        g = self.g
+        return g.bits, g.curr, g.next, g.gems, g.score
+
+    def add(self, before, op, arg):
+        """Record move op/arg, played from state() before to now."""
+        bits, curr, nxt, gems, score = before
+        self.boards.append(bits.to_bytes(self.nbytes, "little"))
+        self.rows.append((self.g.seed, len(self.rows), curr.bit_length()-1, nxt.bit_length()-1, gems, op, arg,
+                          score, self.g.score - score))
+
+    def move(self, op, arg, play):
+        """play() the move op/arg and record it if it was legal."""
+        before, n = self.state(), len(self.g.log)
+        play()
+        if len(self.g.log) > n: self.add(before, op, arg)
+        return len(self.g.log) > n
+
+    def records(self):
+        dt = record_dtype(self.g.rows, self.g.cols)
+        out = np.zeros(len(self.rows), dt)
+        if not self.rows: return out
+        cols = list(zip(*self.rows))
+        for name, vals in zip(("seed", "move", "curr", "next", "gems", "op", "arg", "score", "delta"), cols): out[name] = vals
+        out["board"] = np.frombuffer(b"".join(self.boards), np.uint8).reshape(len(self.rows), self.nbytes)
+        out["final"] = self.g.score
+        out["source"] = self.source
+        return out
+
+
+def record_replay(rep):
+    """Records of one recorded game, or None if it outgrows BitEngine."""
+    g = BitEngine(rep.rows, rep.cols, seed=rep.seed, spawn=rep.spawn or SPAWN_VALUES)
+    rec = Recorder(g, HUMAN)
+    try:
+        for op, arg in decode(rep.actions): rec.move(op, arg, lambda: apply(g, op, arg))
+    except OverflowError: return None
+    return rec.records()
+
+
+def record_sim(name, seed, rows=ROWS, cols=COLS, spawn=SPAWN_VALUES, max_drops=5000):
+    """Records of one bot game (see tournament.py), or None on overflow."""
+    from tournament import STRATEGIES
+    g = BitEngine(rows, cols, seed=seed, undo_depth=0, spawn=spawn)
+    move, rng, rec = STRATEGIES[name], random.Random(seed), Recorder(g, BOT)
+    try:
+        for _ in range(max_drops):
+            if g.over: break
+            before, n = rec.state(), len(g.log)
+            col = move(g, rng)
+            if len(g.log) > n: rec.add(before, SWAP, 0)   # The strategy swapped first
+            if col < 0 or not rec.move(DROP, col, lambda: apply(g, DROP, col)): break
+    except OverflowError: return None
+    return rec.records()
+
+
+_WRITER = None
+
+
+def _sim(args):
+    """Worker: play and append games; returns positions written."""
+    global _WRITER
+    path, name, seeds, rows, cols, spawn = args
+    if _WRITER is None: _WRITER = Writer(path, rows, cols)
+    n = 0
+    for s in seeds:
+        recs = record_sim(name, s, rows, cols, spawn)
+        if recs is not None and len(recs): _WRITER.write(recs); n += len(recs)
+    return n
+
+
+def open_dataset(path):
+    """(records as a read-only numpy memmap, meta) of a dataset file."""
+    with open(path, "rb") as f: start, meta = read_header(f)
+    n = (os.path.getsize(path) - start) // meta["dtype"].itemsize
+    if n == 0: return np.zeros(0, meta["dtype"]), meta
+    return np.memmap(path, meta["dtype"], "r", start, (n,)), meta
+
+
+def boards(data, rows, cols):
+    """(N, rows, cols) uint8 tile exponents of records' packed boards."""
+    b = data["board"]
+    nib = np.empty((len(b), b.shape[1]*2), np.uint8)
+    nib[:, 0::2] = b & 15
+    nib[:, 1::2] = b >> 4
+    return nib[:, :rows*cols].reshape(-1, cols, rows)[:, :, ::-1].transpose(0, 2, 1)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export Drop Merge 2048 positions for training")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("sim", help="bot games from tournament.py strategies")
+    sp.add_argument("-n", "--games", type=int, default=1000)
+    sp.add_argument("-s", "--strategy", default="greedy")
+    sp.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    sp.add_argument("--seed", type=int, default=0)
+    sp.add_argument("--rows", type=int, default=ROWS)
+    sp.add_argument("--cols", type=int, default=COLS)
+    sp.add_argument("--spawn", default=",".join(map(str, SPAWN_VALUES)))
+    rp = sub.add_parser("replays", help="games recorded in a replays file")
+    rp.add_argument("path", nargs="?", default="replays.dat")
+    for p in (sp, rp): p.add_argument("-o", "--out", default="positions.ds", help="dataset file (appended to)")
+    ip = sub.add_parser("info", help="summarise a dataset file")
+    ip.add_argument("path")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.cmd == "info":
+        data, meta = open_dataset(args.path)
+        ops = np.bincount(data["op"], minlength=5) if len(data) else [0]*5
+        games = len(np.unique(data["seed"])) if len(data) else 0
+        print(f"{meta['rows']}x{meta['cols']} boards, {len(data)} positions of {meta['dtype'].itemsize} bytes from ~{games} games")
+        print("  ".join(f"{name} {n}" for name, n in zip(("drop", "swap", "hammer", "undo", "redo"), ops)))
+        return 0
+    if args.cmd == "replays":
+        reps = read_replays(args.path)
+        if os.path.exists(args.out) and os.path.getsize(args.out):
+            with open(args.out, "rb") as f: meta = read_header(f)[1]
+            shape = meta["rows"], meta["cols"]
+        else: shape = (reps[0].rows, reps[0].cols) if reps else (ROWS, COLS)
+        w, n, skipped = Writer(args.out, *shape), 0, 0
+        for rep in reps:
+            recs = record_replay(rep) if (rep.rows, rep.cols) == shape else None
+            if recs is None: skipped += 1; continue   # Another board size, or past 4-bit tiles
+            w.write(recs); n += len(recs)
+        w.close()
+        print(f"{n} positions from {len(reps) - skipped} games ({skipped} skipped) in {time.perf_counter()-t0:.1f}s")
+        return 0
+    spawn = tuple(int(v) for v in args.spawn.split(","))
+    Writer(args.out, args.rows, args.cols).close()   # Header before the workers race
+    chunks = [(args.out, args.strategy, range(s, min(s + 64, args.seed + args.games)), args.rows, args.cols, spawn)
+              for s in range(args.seed, args.seed + args.games, 64)]
+    with Pool(args.jobs) as pool: n = sum(pool.imap_unordered(_sim, chunks))
+    print(f"{n} positions from {args.games} {args.strategy} games in {time.perf_counter()-t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,36 @@
+import time
+T_START = time.perf_counter() # Before the imports, for the --startup report
 import pygame
-import random
 import sys
+import atexit
 import os
-import time
-import math
-import json
-from datetime import datetime
+from collections import deque
+
+from engine import Engine, COLS, ROWS, GEM_TILE, SPAWN_VALUES
+from render_cache import RenderCache
+from assets import Assets
+from particles import ParticlePool
+from scores import open_history
+from actions import Replay, append_replay, board_crc
+from bitboard import pack, MAX_EXP
+from hint import best_move
+from profiler import PROF
 
 # --- CONFIGURATION ---
 WIDTH, HEIGHT = 450, 800
 
+# Simulation runs at a fixed rate whatever the render rate
+SIM_HZ = 60
+STEP_MS = 1000 / SIM_HZ
+MAX_CATCHUP = 5 # Sim steps per rendered frame before dropping time
+HINT_MS = 250 # Search budget for the H key hint
+SPEED = 1.0 # Animation speed multiplier (falls and cascade waits)
+TURBO = False # Resolve cascades at once and play them back without locking input (T key)
+
+def sim_steps(n):
+    """Sim steps for a delay of n steps at SPEED 1"""
+    return round(n / SPEED)
+
 # Vertical Layout
 HEADER_H = 120
 FOOTER_H = 130
@@ -17,19 +38,30 @@ SPAWN_AREA_H = 110
 BOARD_PAD_TOP = 15
 BOARD_PAD_SIDE = 15
 
-# Calc Board Size
-AVAIL_H = HEIGHT - HEADER_H - FOOTER_H - SPAWN_AREA_H - BOARD_PAD_TOP
-COLS, ROWS = 5, 7
-GAP = 8
-
-# Tile Dimensions
-CELL_W = (WIDTH - (BOARD_PAD_SIDE*2) - (COLS-1)*GAP) // COLS
-CELL_H = (AVAIL_H - (ROWS-1)*GAP) // ROWS
-TILE_SIZE = min(CELL_W, CELL_H)
-BOARD_W = TILE_SIZE*COLS + GAP*(COLS-1)
-BOARD_H = TILE_SIZE*ROWS + GAP*(ROWS-1)
-BOARD_X = (WIDTH - BOARD_W) // 2
-BOARD_Y = HEADER_H + BOARD_PAD_TOP
+def configure(rows=ROWS, cols=COLS, width=WIDTH, height=HEIGHT, spawn=SPAWN_VALUES):
+    """Board shape, spawn list and window size. Call before main()."""
+    global ROWS, COLS, WIDTH, HEIGHT, SPAWN, AVAIL_H, GAP, CELL_W, CELL_H, TILE_SIZE, RADIUS
+    global BOARD_W, BOARD_H, BOARD_X, BOARD_Y, _TILEMAP
+    ROWS, COLS, WIDTH, HEIGHT, SPAWN = rows, cols, width, height, tuple(spawn)
+
+    # Calc Board Size (gaps shrink on big boards so the tiles keep the room)
+    AVAIL_H = HEIGHT - HEADER_H - FOOTER_H - SPAWN_AREA_H - BOARD_PAD_TOP
+    GAP = max(1, min(8, (WIDTH - BOARD_PAD_SIDE*2)//(COLS*5), AVAIL_H//(ROWS*5)))
+
+    # Tile Dimensions
+    CELL_W = (WIDTH - (BOARD_PAD_SIDE*2) - (COLS-1)*GAP) // COLS
+    CELL_H = (AVAIL_H - (ROWS-1)*GAP) // ROWS
+    TILE_SIZE = max(1, min(CELL_W, CELL_H))
+    RADIUS = min(8, TILE_SIZE//4)
+    BOARD_W = TILE_SIZE*COLS + GAP*(COLS-1)
+    BOARD_H = TILE_SIZE*ROWS + GAP*(ROWS-1)
+    BOARD_X = (WIDTH - BOARD_W) // 2
+    BOARD_Y = HEADER_H + BOARD_PAD_TOP
+    _TILEMAP = None
+
+_TILEMAP = None
+configure()
+REF_TILE = TILE_SIZE # Font sizes below are for this tile size
 
 # --- THEME PALETTE ---
 C_BG            = (18, 14, 28)       # Deep Night
@@ -60,111 +92,91 @@ TILE_COLORS = {
     1024: ((40, 40, 40),   (255,255,255)),
 }
 
+def tile_colors(v):
+    """(background, text) of tile v. Past 1024 hues cycle per doubling."""
+    c = TILE_COLORS.get(v)
+    if c is None:
+        bg = pygame.Color(0)
+        bg.hsva = ((v.bit_length()-1)*47 % 360, 75, 85, 100)
+        c = TILE_COLORS[v] = (tuple(bg)[:3], (255,255,255))
+    return c
+
+def tile_font(v, size):
+    """Text size for v on a tile, where size is the size at REF_TILE."""
+    if len(str(v)) > 4: size = size*4 // len(str(v))
+    return size*TILE_SIZE // REF_TILE
+
 # Image Config
 ICON_PATHS = {"H": "icon_hammer.png", "S": "icon_swap.png", "U": "icon_undo.png"}
+REPLAY_FILE = "replays.dat" # Seed + action log of every finished game (see replay.py)
 FONT_NAME = "segoeui" if os.name == 'nt' else "arial"
+FONT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts.json") # Font files FONT_NAME resolved to, so later starts skip the system font scan
 
 # --- SYSTEM UTILS ---
 
+RC = RenderCache(FONT_NAME, font_cache=FONT_CACHE)
+ASSETS = Assets(ICON_PATHS, watch=os.environ.get("DM2048_WATCH_ASSETS") == "1")
+
 def load_icon(char, size=40):
-    path = ICON_PATHS.get(char, "")
-    if os.path.exists(path):
-        try:
-            img = pygame.image.load(path).convert_alpha()
-            return pygame.transform.smoothscale(img, (size, size)), None
-        except: pass
-    return None, char
+    return ASSETS.icon(char, size)
 
 def draw_rounded(surf, col, rect, r=10):
     pygame.draw.rect(surf, col, rect, border_radius=r)
 
-# --- MANAGERS ---
-
-class HistoryManager:
-    """Handles Score Saving & History List"""
-    def __init__(self):
-        self.filename = "history.json"
-        self.scores = self.load() # List of dicts {score, date}
-    
-    def load(self):
-        if not os.path.exists(self.filename): return []
-        try:
-            with open(self.filename, 'r') as f: return json.load(f)
-        except: return []
-
-    def add_entry(self, score):
-        if score == 0: return
-        now = datetime.now().strftime("%Y-%m-%d %H:%M")
-        entry = {"score": score, "date": now}
-        self.scores.append(entry)
-        self.scores.sort(key=lambda x: x['score'], reverse=True)
-        self.scores = self.scores[:50]
-        self.save()
-    
-    def save(self):
-        with open(self.filename, 'w') as f: json.dump(self.scores, f)
-
-    def get_best(self):
-        if not self.scores: return 0
-        return self.scores[0]['score']
-
 # --- VISUALS ---
 
-class Particle:
-    def __init__(self, x, y, color, gravity=0.5, life_speed=0.05):
-        self.x=x; self.y=y; self.color=color
-        a=random.uniform(0, 6.28); s=random.uniform(2, 6)
-        self.vx=math.cos(a)*s; self.vy=math.sin(a)*s
-        self.life=1.0; self.grav=gravity; self.dec=life_speed
-    def update(self):
-        self.x+=self.vx; self.y+=self.vy; self.vy+=self.grav
-        self.life-=self.dec
-        return self.life>0
-    def draw(self, s):
-        alp = int(255*self.life)
-        if alp>0:
-            surf = pygame.Surface((6,6), pygame.SRCALPHA)
-            pygame.draw.circle(surf, (*self.color[:3], alp), (3,3), 3)
-            s.blit(surf, (self.x, self.y))
-
 class FloatText:
     def __init__(self, text, x, y, color):
         self.text=str(text); self.x=x; self.y=y; self.col=color
-        self.font=pygame.font.SysFont(FONT_NAME, 30, bold=True)
+        self.surf=RC.text(self.text, 30, color).copy() # own copy: alpha changes
         self.alpha=255
+        self.prev_y=y
     def update(self):
+        self.prev_y=self.y
         self.y-=2; self.alpha-=4
         return self.alpha>0
-    def draw(self, s):
-        tx = self.font.render(self.text, True, self.col)
-        tx.set_alpha(self.alpha)
-        s.blit(tx, tx.get_rect(center=(self.x, self.y)))
+    def rect(self, frac=1.0):
+        return self.surf.get_rect(center=(self.x, self.prev_y + (self.y-self.prev_y)*frac))
+    def draw(self, s, frac=1.0):
+        self.surf.set_alpha(self.alpha)
+        s.blit(self.surf, self.rect(frac))
 
 class VisualFX:
     def __init__(self):
-        self.particles = []
+        self.particles = ParticlePool()
         self.texts = []
 
     def spawn_confetti(self):
-        for _ in range(50):
-            x = random.randint(0, WIDTH)
-            y = random.randint(0, HEIGHT//2)
-            c = random.choice([C_ACCENT, C_PURPLE_GLOW, (0,255,255)])
-            self.particles.append(Particle(x,y,c, gravity=0.1, life_speed=0.01))
+        rng = self.particles.rng
+        x = rng.integers(0, WIDTH, 50, endpoint=True)
+        y = rng.integers(0, HEIGHT//2, 50, endpoint=True)
+        self.particles.emit(x, y, [C_ACCENT, C_PURPLE_GLOW, (0,255,255)], 50, gravity=0.1, life_speed=0.01)
 
     def spawn_merge_poof(self, x, y, color):
-        for _ in range(12):
-            self.particles.append(Particle(x,y,color))
+        self.particles.emit(x, y, color, 12)
 
     def add_msg(self, text, x, y, col):
         self.texts.append(FloatText(text, x, y, col))
 
-    def update(self, screen):
-        self.particles = [p for p in self.particles if p.update()]
-        for p in self.particles: p.draw(screen)
-        
+    def step(self):
+        self.particles.update()
         self.texts = [t for t in self.texts if t.update()]
-        for t in self.texts: t.draw(screen)
+
+    def draw(self, screen, frac=1.0):
+        self.particles.draw(screen, frac)
+        for t in self.texts: t.draw(screen, frac)
+
+    def update(self, screen):
+        self.step()
+        self.draw(screen)
+
+    def bounds(self):
+        """Rect covering everything draw() may paint this step, or None"""
+        rects = [t.rect(0).union(t.rect(1)) for t in self.texts]
+        pb = self.particles.bounds()
+        if pb: rects.append(pygame.Rect(pb))
+        if not rects: return None
+        return rects[0].unionall(rects[1:])
 
 class FallingBlock:
     def __init__(self, r, c, val):
@@ -172,74 +184,72 @@ class FallingBlock:
         self.target_y = BOARD_Y + GAP + r*(TILE_SIZE+GAP)
         self.x = BOARD_X + GAP + c*(TILE_SIZE+GAP)
         self.y = BOARD_Y - TILE_SIZE # Start above
-        self.vy = 25 # Fast speed
+        self.prev_y = self.y
+        self.vy = 25*SPEED # Fast speed, px per sim step
         self.done = False
     def update(self):
+        self.prev_y = self.y
         self.y += self.vy
         if self.y >= self.target_y:
             self.y = self.target_y
             self.done = True
-    def draw(self, s):
-        bg, txt = TILE_COLORS.get(self.val, TILE_COLORS[1024])
-        r = pygame.Rect(self.x, self.y, TILE_SIZE, TILE_SIZE)
-        draw_rounded(s, bg, r, 8)
-        f = pygame.font.SysFont(FONT_NAME, 32, bold=True)
-        t = f.render(str(self.val), True, txt)
-        s.blit(t, t.get_rect(center=r.center))
+    def draw_y(self, frac=1.0):
+        return self.prev_y + (self.y - self.prev_y)*frac
+    def draw(self, s, frac=1.0):
+        s.blit(falling_tile(self.val), (self.x, self.draw_y(frac)))
 
 # --- MAIN GAME CLASS ---
 
-class GamePro:
+class GamePro(Engine):
+    """Engine plus the frame-timed animation state machine and FX"""
     def __init__(self):
-        self.hist_mgr = HistoryManager()
+        self._hist = None
         self.fx = VisualFX()
-        self.reset()
-        
-    def reset(self):
-        self.board = [[0]*COLS for _ in range(ROWS)]
-        self.score = 0
-        self.best_at_start = self.hist_mgr.get_best()
+        self.turbo = TURBO
+        super().__init__(ROWS, COLS, spawn=SPAWN)
+
+    def reset(self, seed=None):
+        # Spawns are seeded per game so the action log can replay it
+        super().reset(seed=int.from_bytes(os.urandom(8), "little") if seed is None else seed)
+        self.gen = getattr(self, "gen", 0) + 1 # Bumped on every board change
+        self.best_at_start = None # The history's best when this game first scores
         self.celebrated_best = False
         
-        self.gems = 20
-        self.curr = self.rnd()
-        self.next = self.rnd()
-        
         self.state = "IDLE" 
-        self.undo_stack = []
         self.hammer_on = False
         self.timer = 0
         self.fallers = []
-
-    def rnd(self): return random.choice([2,2,4,4,8,8,16])
-
-    def save_state(self):
-        if len(self.undo_stack) > 3: self.undo_stack.pop(0)
-        snapshot = {
-            'b': [row[:] for row in self.board],
-            's': self.score,
-            'g': self.gems,
-            'c': self.curr,
-            'n': self.next
-        }
-        self.undo_stack.append(snapshot)
+        self.hint = self.hint_job = None
+        # Turbo playback: the board on screen while (board, wait, merges) frames play
+        self.view = None
+        self.playback = deque()
+
+    @property
+    def hist_mgr(self):
+        """Score history, opened on first use. The window's header needs it for the
+        first frame; tools that never draw it (video.py, bench.py) never open it."""
+        if self._hist is None: self._hist = open_history(os.environ.get("DM2048_SCORES"))
+        return self._hist
 
     def restore_state(self):
-        if self.gems < 5 or not self.undo_stack: return
-        self.gems -= 5
-        st = self.undo_stack.pop()
-        self.board = st['b']
-        self.score = st['s']
-        self.gems = st['g'] - 5 
-        self.curr = st['c']
-        self.next = st['n']
-        self.fx.add_msg("UNDO", WIDTH//2, HEIGHT-200, C_WHITE)
+        self.skip_playback()
+        if self.state == "IDLE" and self.undo():
+            self.gen += 1
+            self.fx.add_msg("UNDO", WIDTH//2, HEIGHT-200, C_WHITE)
+
+    def redo_state(self):
+        self.skip_playback()
+        if self.state == "IDLE" and self.redo():
+            self.gen += 1
+            self.fx.add_msg("REDO", WIDTH//2, HEIGHT-200, C_WHITE)
 
     def update_logic(self):
-        if self.score > self.best_at_start and not self.celebrated_best and self.best_at_start > 0:
-            self.celebrated_best = True
-            self.fx.spawn_confetti()
-            self.fx.add_msg("NEW RECORD!", WIDTH//2, HEADER_H + 50, C_MSG_RECORD)
+        if self.score and not self.celebrated_best:
+            if self.best_at_start is None: self.best_at_start = self.hist_mgr.get_best()
+            if self.score > self.best_at_start > 0:
+                self.celebrated_best = True
+                self.fx.spawn_confetti()
+                self.fx.add_msg("NEW RECORD!", WIDTH//2, HEADER_H + 50, C_MSG_RECORD)
 
         if self.state == "FALL":
             active = False
@@ -250,13 +260,16 @@ class GamePro:
             if not active:
                 for b in self.fallers:
                     self.board[b.r][b.c] = b.val
+                    self.detect.touch(b.r, b.c)
+                self.gen += 1
                 self.fallers = []
                 
                 if self.check_loss():
+                    self.state = "OVER"
                     self.end_game()
                 else:
                     self.state = "MERGE_WAIT"
-                    self.timer = 5
+                    self.timer = sim_steps(5)
         
         elif self.state == "MERGE_WAIT":
             if self.timer>0: self.timer-=1
@@ -264,7 +277,7 @@ class GamePro:
                 hit = self.check_merges()
                 if hit:
                     self.state = "GRAVITY_WAIT"
-                    self.timer = 15
+                    self.timer = sim_steps(15)
                 else:
                     self.state = "IDLE"
         
@@ -273,207 +286,344 @@ class GamePro:
             else:
                 self.apply_gravity()
                 self.state = "MERGE_WAIT"
-                self.timer = 5
+                self.timer = sim_steps(5)
 
-    def check_merges(self):
-        visited = set()
-        merged = False
-        for r in range(ROWS-1, -1, -1):
-            for c in range(COLS):
-                if self.board[r][c] == 0 or (r,c) in visited: continue
-                val = self.board[r][c]
-                group = self.bfs_group(r, c, val)
-                if len(group) >= 2:
-                    merged = True
-                    group.sort(key=lambda x: x[0], reverse=True)
-                    anchor = group[0]
-                    new_val = val * 2
-                    self.score += new_val
-                    
-                    if new_val==512: self.gems+=2; self.fx.add_msg("GEMS!", WIDTH//2, HEIGHT//2, C_ACCENT)
-
-                    for cell in group:
-                        visited.add(cell)
-                        # Fix: Use TILE_COLORS here instead of missing gradients var
-                        col_rgb = TILE_COLORS.get(val, TILE_COLORS[1024])[0]
-                        self.fx.spawn_merge_poof(
-                            BOARD_X+GAP+cell[1]*(TILE_SIZE+GAP)+TILE_SIZE//2,
-                            BOARD_Y+GAP+cell[0]*(TILE_SIZE+GAP)+TILE_SIZE//2, col_rgb)
-                        
-                        if cell == anchor:
-                            self.board[cell[0]][cell[1]] = new_val
-                            px = BOARD_X+GAP+cell[1]*(TILE_SIZE+GAP)+TILE_SIZE//2
-                            py = BOARD_Y+GAP+cell[0]*(TILE_SIZE+GAP)
-                            self.fx.add_msg(f"+{new_val}", px, py, C_WHITE)
-                        else:
-                            self.board[cell[0]][cell[1]] = 0
-
-        return merged
-
-    def bfs_group(self, r, c, val):
-        stack = [(r,c)]
-        grp = []
-        while stack:
-            curr = stack.pop()
-            if curr in grp: continue
-            grp.append(curr)
-            for d in [(0,1),(0,-1),(1,0),(-1,0)]:
-                nr,nc = curr[0]+d[0], curr[1]+d[1]
-                if 0<=nr<ROWS and 0<=nc<COLS and self.board[nr][nc]==val:
-                    stack.append((nr,nc))
-        return grp
+        if self.view is not None: self.play_back()
 
-    def apply_gravity(self):
-        for c in range(COLS):
-            col_dat = [self.board[r][c] for r in range(ROWS) if self.board[r][c]!=0]
-            new_col = [0]*(ROWS-len(col_dat)) + col_dat
-            for r in range(ROWS): self.board[r][c] = new_col[r]
+    def check_merges(self):
+        merges = super().check_merges()
+        if merges: self.gen += 1
+        self.merge_fx(merges)
+        return merges
+
+    def merge_fx(self, merges):
+        for m in merges:
+            if m.new_val==GEM_TILE: self.fx.add_msg("GEMS!", WIDTH//2, HEIGHT//2, C_ACCENT)
+            col_rgb = tile_colors(m.val)[0]
+            for r, c in m.cells:
+                self.fx.spawn_merge_poof(
+                    BOARD_X+GAP+c*(TILE_SIZE+GAP)+TILE_SIZE//2,
+                    BOARD_Y+GAP+r*(TILE_SIZE+GAP)+TILE_SIZE//2, col_rgb)
+            r, c = m.anchor
+            px = BOARD_X+GAP+c*(TILE_SIZE+GAP)+TILE_SIZE//2
+            py = BOARD_Y+GAP+r*(TILE_SIZE+GAP)
+            self.fx.add_msg(f"+{m.new_val}", px, py, C_WHITE)
+
+    def shown_board(self):
+        """What the board looks like on screen (a turbo playback lags behind)"""
+        return self.board if self.view is None else self.view
+
+    def play_back(self):
+        """One sim step of a turbo playback: faller, then frame by frame"""
+        if self.fallers:
+            for b in self.fallers: b.update()
+            if all(b.done for b in self.fallers): self.fallers = []
+        elif self.timer > 0: self.timer -= 1
+        elif self.playback:
+            self.view, self.timer, merges = self.playback.popleft()
+            self.gen += 1
+            self.merge_fx(merges)
+        else:
+            self.view = None
+            self.gen += 1
+
+    def skip_playback(self):
+        """Jump to the end of a turbo playback (skipped merges still get FX)"""
+        if self.view is None: return
+        for _, _, merges in self.playback: self.merge_fx(merges)
+        self.playback.clear()
+        self.view = None
+        self.fallers = []
+        self.timer = 0
+        self.gen += 1
+
+    def turbo_drop(self, col):
+        """Resolve the drop and its whole cascade now and queue its frames"""
+        before = [row[:] for row in self.board]
+        val = self.curr
+        lr = self.drop(col)
+        if lr == -1: return
+        self.view = before
+        self.fallers = [FallingBlock(lr, col, val)]
+        self.gen += 1
+        frame = lambda wait, merges=(): self.playback.append(([row[:] for row in self.board], sim_steps(wait), merges))
+        frame(5)
+        if self.check_loss():
+            self.skip_playback()
+            self.state = "OVER"
+            self.end_game()
+            return
+        while True:
+            merges = super().check_merges() # FX wait for the frame
+            if not merges: break
+            frame(15, merges)
+            super().apply_gravity()
+            frame(5)
+
+    def toggle_turbo(self):
+        self.turbo = not self.turbo
+        self.fx.add_msg("TURBO ON" if self.turbo else "TURBO OFF", WIDTH//2, HEIGHT-200, C_ACCENT)
 
     def action_drop(self, col):
         if self.state != "IDLE": return
-        lr = -1
-        for r in range(ROWS-1, -1, -1):
-            if self.board[r][col] == 0:
-                lr = r; break
-        if lr == -1: return 
-        self.save_state()
-        self.fallers = [FallingBlock(lr, col, self.curr)]
-        self.curr = self.next
-        self.next = self.rnd()
+        self.skip_playback() # Dropping again skips what's left
+        if self.turbo: return self.turbo_drop(col)
+        val = self.curr
+        lr = self.drop(col)
+        if lr == -1: return
+        self.board[lr][col] = 0 # Lands when the faller does
+        self.fallers = [FallingBlock(lr, col, val)]
         self.state = "FALL"
     
     def action_swap(self):
-        if self.gems < 2: return
-        self.save_state()
-        self.gems -= 2
-        self.curr, self.next = self.next, self.curr
-        self.fx.add_msg("SWAP", WIDTH//2, HEIGHT-200, C_ACCENT)
+        if self.state == "IDLE" and self.swap():
+            self.fx.add_msg("SWAP", WIDTH//2, HEIGHT-200, C_ACCENT)
+
+    def apply_gravity(self):
+        moved = super().apply_gravity()
+        if moved: self.gen += 1
+        return moved
 
     def action_hammer(self, r, c):
-        if self.board[r][c] != 0:
-            self.save_state()
-            self.gems -= 10
-            self.board[r][c] = 0
+        if self.state != "IDLE": return # Mid-cascade it would land in the log before the cascade ends
+        self.skip_playback()
+        if self.hammer(r, c):
+            self.gen += 1
             self.fx.spawn_merge_poof(
                  BOARD_X+GAP+c*(TILE_SIZE+GAP)+TILE_SIZE//2, 
                  BOARD_Y+GAP+r*(TILE_SIZE+GAP)+TILE_SIZE//2, C_WHITE)
             self.hammer_on = False
-            self.apply_gravity()
-
-    def check_loss(self):
-        full = 0
-        for c in range(COLS):
-            if self.board[0][c] != 0: full += 1
-        return full == COLS
         
+    def hint_key(self): return (self.seed, len(self.log), self.curr, self.next, self.gems)
+
+    def request_hint(self):
+        """Start a search in the hint process; poll_hint picks it up."""
+        if self.state != "IDLE" or self.hint_job: return
+        if max(map(max, self.board)) >> MAX_EXP+1: return # Past what the search packs
+        if getattr(self, "hint_pool", None) is None:
+            from concurrent.futures import ProcessPoolExecutor # First hint only, not at startup
+            self.hint_pool = ProcessPoolExecutor(1)
+        fut = self.hint_pool.submit(best_move, pack(self.board, ROWS, COLS), self.curr, self.next, self.gems, HINT_MS,
+                                    ROWS, COLS, spawn=self.spawn)
+        self.hint_job = (self.hint_key(), fut)
+
+    def poll_hint(self):
+        if not self.hint_job or not self.hint_job[1].done(): return
+        key, fut = self.hint_job
+        self.hint_job = None
+        move = fut.result()
+        if move is None or key != self.hint_key(): return # Position moved on
+        self.hint = (key, move.col)
+        if move.swap: self.fx.add_msg("HINT: SWAP FIRST", WIDTH//2, HEIGHT-200, C_ACCENT)
+
+    def hint_col(self):
+        """Suggested column while the position it was searched for lasts"""
+        return self.hint[1] if self.hint and self.hint[0] == self.hint_key() else -1
+
+    def settle(self):
+        """Run a pending fall/merge cascade to the end without waiting."""
+        while self.state in ("FALL", "MERGE_WAIT", "GRAVITY_WAIT"): self.update_logic()
+        self.skip_playback()
+
     def end_game(self):
+        self.settle() # The saved score must match what the log replays to
+        if self.over: return # Already recorded
+        self.over = True
         self.state = "OVER"
         self.hist_mgr.add_entry(self.score)
+        if self.log.moves:
+            spawn = () if self.spawn == SPAWN_VALUES else self.spawn
+            append_replay(REPLAY_FILE, Replay(self.score, int(time.time()), self.seed, self.rows, self.cols,
+                                              board_crc(self.board), bytes(self.log), spawn))
 
 # --- RENDERER ---
 
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("2048: Fusion Pro")
-clock = pygame.time.Clock()
-G = GamePro()
-
-def draw_text(t, x, y, size=20, col=C_WHITE, align="center"):
-    f = pygame.font.SysFont(FONT_NAME, size, bold=True)
-    surf = f.render(str(t), True, col)
-    if align=="center": r = surf.get_rect(center=(x,y))
-    else: r = surf.get_rect(topleft=(x,y))
-    screen.blit(surf, r)
-
-def draw_ui():
-    screen.fill(C_BG)
-
-    # 1. BOARD
-    br = pygame.Rect(BOARD_X-5, BOARD_Y-5, BOARD_W+10, BOARD_H+10)
-    draw_rounded(screen, C_PANEL_DARK, br, 15)
+# Created by main(); importing this module has no side effects.
+screen = None
+clock = None
+G = None
+
+def draw_text(t, x, y, size=20, col=C_WHITE, align="center", surf=None):
+    tx = RC.text(t, size, col)
+    if align=="center": r = tx.get_rect(center=(x,y))
+    else: r = tx.get_rect(topleft=(x,y))
+    (surf or screen).blit(tx, r)
+
+def screen_regions():
+    """Bands of the play screen that are redrawn independently (they tile it)"""
+    # Tiles sit GAP lower than the panel and can poke out of its bottom
+    board_bottom = max(BOARD_Y + BOARD_H + 5, BOARD_Y + ROWS*(TILE_SIZE+GAP) + 1)
+    footer_y = HEIGHT - 110
+    return {
+        "header": pygame.Rect(0, 0, WIDTH, HEADER_H),
+        "board": pygame.Rect(0, HEADER_H, WIDTH, board_bottom - HEADER_H),
+        "spawner": pygame.Rect(0, board_bottom, WIDTH, footer_y - board_bottom),
+        "footer": pygame.Rect(0, footer_y, WIDTH, HEIGHT - footer_y),
+    }
+
+def footer_buttons():
+    bx = (WIDTH - (3*70 + 40))//2
+    by = HEIGHT - 110
+    return [pygame.Rect(bx + idx*90, by, 70, 70) for idx in range(3)]
 
-    mx, my = pygame.mouse.get_pos()
-    col_hov = -1
+def board_hover(mx, my):
     if G.state == "IDLE" and not G.hammer_on:
+         if G.hint_col() >= 0: return G.hint_col() # A hint outranks the mouse
          if BOARD_X <= mx <= BOARD_X+BOARD_W and BOARD_Y <= my <= BOARD_Y+BOARD_H:
-              col_hov = (mx - BOARD_X) // (TILE_SIZE+GAP)
+              return (mx - BOARD_X) // (TILE_SIZE+GAP)
+    return -1
 
+def footer_hover(mx, my):
+    for idx, r in enumerate(footer_buttons()):
+        if r.collidepoint(mx, my): return idx
+    return -1
+
+def draw_static(surf):
+    """Everything that never changes: background, panels, slots, menu button"""
+    surf.fill(C_BG)
+    br = pygame.Rect(BOARD_X-5, BOARD_Y-5, BOARD_W+10, BOARD_H+10)
+    draw_rounded(surf, C_PANEL_DARK, br, 15)
     for c in range(COLS):
         bx = BOARD_X + GAP + c*(TILE_SIZE+GAP)
-        sl = pygame.Rect(bx, BOARD_Y+GAP, TILE_SIZE, BOARD_H-GAP)
-        draw_rounded(screen, C_SLOT, sl, 8)
-        
-        if col_hov == c:
-             s = pygame.Surface((TILE_SIZE, sl.height), pygame.SRCALPHA)
-             s.fill(C_PASTEL_PURP)
-             screen.blit(s, (bx, sl.y))
-             
-        for r in range(ROWS):
-            v = G.board[r][c]
-            if v != 0:
-                y = BOARD_Y + GAP + r*(TILE_SIZE+GAP)
-                draw_cell(bx, y, v)
-
-    for b in G.fallers: b.draw(screen)
-
-    # 2. HEADER
-    pygame.draw.rect(screen, (25, 18, 35), (0,0,WIDTH,HEADER_H))
-    draw_text("SCORE", WIDTH//2, 30, 14, (150,140,180))
-    draw_text(str(G.score), WIDTH//2, 60, 50, C_WHITE)
-    
-    gem_rect = pygame.Rect(30, 75, 80, 30)
-    pygame.draw.rect(screen, (0,0,0), gem_rect, border_radius=15)
-    draw_text(f"💎 {G.gems}", 70, 90, 18, C_ACCENT)
-    
-    best_curr = max(G.score, G.hist_mgr.get_best())
-    draw_text(f"🏆 {best_curr}", 60, 40, 18, (0,200,200))
-    
+        draw_rounded(surf, C_SLOT, pygame.Rect(bx, BOARD_Y+GAP, TILE_SIZE, BOARD_H-GAP), RADIUS)
+
+    pygame.draw.rect(surf, (25, 18, 35), (0,0,WIDTH,HEADER_H))
+    pygame.draw.rect(surf, (0,0,0), pygame.Rect(30, 75, 80, 30), border_radius=15)
     btn_m = pygame.Rect(WIDTH-60, 30, 45, 45)
-    draw_rounded(screen, C_BTN_OFF, btn_m, 10)
+    draw_rounded(surf, C_BTN_OFF, btn_m, 10)
     cx, cy = btn_m.centerx, btn_m.centery
     for dy in [-6, 0, 6]:
-        pygame.draw.line(screen, C_WHITE, (cx-10, cy+dy), (cx+10, cy+dy), 2)
-    
-    # 3. SPAWNER
+        pygame.draw.line(surf, C_WHITE, (cx-10, cy+dy), (cx+10, cy+dy), 2)
+
+class Tilemap:
+    """The static layer with the hover overlay and tiles drawn on it.
+
+    update() compares the board with what was last drawn and repaints only
+    the cells that changed (and the columns the hover left or entered),
+    so a move on a 64x128 board touches a handful of cells, not 8192.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.static = screen.copy(); draw_static(self.static)
+        self.surf = self.static.copy()
+        self.shown = [[0]*COLS for _ in range(ROWS)]
+        self.hov = -1
+        self.gen = None
+
+    def reset(self):
+        """Repaint the whole board next update"""
+        self.surf.blit(self.static, (0, 0))
+        self.shown = [[0]*COLS for _ in range(ROWS)]
+        self.hov = -1
+        self.gen = None
+
+    def cell_rect(self, r, c):
+        """Tile with its 1px outline margin"""
+        return pygame.Rect(BOARD_X+GAP+c*(TILE_SIZE+GAP)-1, BOARD_Y+GAP+r*(TILE_SIZE+GAP)-1, TILE_SIZE+2, TILE_SIZE+2)
+
+    def overlay_rect(self, c):
+        return pygame.Rect(BOARD_X+GAP+c*(TILE_SIZE+GAP), BOARD_Y+GAP, TILE_SIZE, BOARD_H-GAP)
+
+    def repaint(self, rect):
+        """Redraw static, overlay and every tile reaching into rect"""
+        s, step = self.surf, TILE_SIZE+GAP
+        s.set_clip(rect)
+        s.blit(self.static, rect, rect)
+        if self.hov >= 0 and self.overlay_rect(self.hov).colliderect(rect):
+            s.fill(C_PASTEL_PURP, self.overlay_rect(self.hov))
+        c0, c1 = max(0, (rect.left-BOARD_X-GAP)//step - 1), min(COLS, (rect.right-BOARD_X-GAP)//step + 2)
+        r0, r1 = max(0, (rect.top-BOARD_Y-GAP)//step - 1), min(ROWS, (rect.bottom-BOARD_Y-GAP)//step + 2)
+        for c in range(c0, c1):
+            for r in range(r0, r1):
+                v = self.shown[r][c]
+                if v and self.cell_rect(r, c).colliderect(rect): draw_cell(*self.cell_rect(r, c).move(1, 1).topleft, v, s)
+        s.set_clip(None)
+
+    def update(self, hov):
+        """The layer for G.board with column hov highlighted"""
+        if self.gen != G.gen:
+            self.gen = G.gen
+            for r, (row, shown) in enumerate(zip(G.shown_board(), self.shown)):
+                if row == shown: continue
+                for c in range(COLS):
+                    if row[c] != shown[c]:
+                        shown[c] = row[c]
+                        self.repaint(self.cell_rect(r, c))
+        if hov != self.hov:
+            old, self.hov = self.hov, hov
+            for c in (old, hov):
+                if c >= 0: self.repaint(self.overlay_rect(c).union(self.cell_rect(ROWS-1, c)).union(self.cell_rect(0, c)))
+        return self.surf
+
+def tilemap():
+    """The Tilemap of G at the current layout"""
+    global _TILEMAP
+    if _TILEMAP is None or _TILEMAP.game is not G: _TILEMAP = Tilemap(G)
+    return _TILEMAP
+
+def draw_fallers(surf, region, frac=1.0):
+    # The header covers fallers still above the board
+    surf.set_clip(region)
+    for b in G.fallers: b.draw(surf, frac)
+    surf.set_clip(None)
+
+def draw_header(surf):
+    draw_text("SCORE", WIDTH//2, 30, 14, (150,140,180), surf=surf)
+    draw_text(str(G.score), WIDTH//2, 60, 50, C_WHITE, surf=surf)
+    draw_text(f"💎 {G.gems}", 70, 90, 18, C_ACCENT, surf=surf)
+    best_curr = max(G.score, G.hist_mgr.get_best())
+    draw_text(f"🏆 {best_curr}", 60, 40, 18, (0,200,200), surf=surf)
+
+def draw_spawner(surf):
     cy = BOARD_Y + BOARD_H + 40
-    draw_text("NEXT", WIDTH//2 + 90, cy-15, 12, (100,100,100))
+    draw_text("NEXT", WIDTH//2 + 90, cy-15, 12, (100,100,100), surf=surf)
     nx_r = pygame.Rect(WIDTH//2+75, cy, 30, 30)
-    bg, tx = TILE_COLORS.get(G.next, TILE_COLORS[2])
-    draw_rounded(screen, bg, nx_r, 6)
-    draw_text(str(G.next), nx_r.centerx, nx_r.centery, 16, tx)
+    bg, tx = tile_colors(G.next)
+    draw_rounded(surf, bg, nx_r, 6)
+    draw_text(str(G.next), nx_r.centerx, nx_r.centery, 16, tx, surf=surf)
     
-    bg_c, tx_c = TILE_COLORS.get(G.curr, TILE_COLORS[2])
+    bg_c, tx_c = tile_colors(G.curr)
     cur_r = pygame.Rect(0,0,75,75)
     cur_r.center = (WIDTH//2, cy+10)
-    pygame.draw.rect(screen, (255,255,255), cur_r.inflate(4,4), border_radius=14)
-    draw_rounded(screen, bg_c, cur_r, 12)
-    draw_text(str(G.curr), cur_r.centerx, cur_r.centery, 40, tx_c)
+    pygame.draw.rect(surf, (255,255,255), cur_r.inflate(4,4), border_radius=14)
+    draw_rounded(surf, bg_c, cur_r, 12)
+    draw_text(str(G.curr), cur_r.centerx, cur_r.centery, 40, tx_c, surf=surf)
 
-    # 4. FOOTER
+def draw_footer(surf, hov):
     btns = [
         ("HAMMER (10)", "H", G.hammer_on, 10),
         ("SWAP (2)", "S", False, 2),
         ("UNDO (5)", "U", False, 5)
     ]
-    bx = (WIDTH - (3*70 + 40))//2
-    by = HEIGHT - 110
-    
-    for idx, (label, icon, act, cost) in enumerate(btns):
-        x = bx + idx*90
-        r = pygame.Rect(x, by, 70, 70)
+    for idx, ((label, icon, act, cost), r) in enumerate(zip(btns, footer_buttons())):
         col = C_BTN_OFF
-        if G.gems >= cost and r.collidepoint(mx, my): col = (100, 80, 120)
+        if G.gems >= cost and hov == idx: col = (100, 80, 120)
         if act: col = C_BTN_ON
-        draw_rounded(screen, col, r, 16)
+        draw_rounded(surf, col, r, 16)
         
         ic, _ = load_icon(icon)
-        if ic: screen.blit(ic, ic.get_rect(center=(r.centerx, r.centery-10)))
-        else: draw_text(icon, r.centerx, r.centery-10, 30)
+        if ic: surf.blit(ic, ic.get_rect(center=(r.centerx, r.centery-10)))
+        else: draw_text(icon, r.centerx, r.centery-10, 30, surf=surf)
         c_col = C_ACCENT if G.gems >= cost else (150,150,150)
-        draw_text(str(cost), r.centerx, r.centery+20, 16, c_col)
+        draw_text(str(cost), r.centerx, r.centery+20, 16, c_col, surf=surf)
+
+def draw_ui(frac=1.0):
+    """Full redraw of the play screen (menus and overlays draw through this).
+
+    frac is how far render time is between the last two sim steps."""
+    mx, my = pygame.mouse.get_pos()
+    T = tilemap()
+    with PROF.span("static"): screen.blit(T.static, (0, 0))
+    with PROF.span("board"):
+        r = screen_regions()["board"]
+        screen.blit(T.update(board_hover(mx, my)), r, r)
+        draw_fallers(screen, r, frac)
+    with PROF.span("header"): draw_header(screen)
+    with PROF.span("spawner"): draw_spawner(screen)
+    with PROF.span("footer"): draw_footer(screen, footer_hover(mx, my))
 
     # 5. OVERLAYS
-    G.fx.update(screen)
+    with PROF.span("fx.draw"): G.fx.draw(screen, frac)
     
     if G.state == "OVER":
         draw_overlay("GAME OVER", "Open Menu to Restart", (255, 100, 100))
@@ -484,15 +634,39 @@ def draw_ui():
     if G.state == "HISTORY":
         draw_history_page(mx, my)
 
-def draw_cell(x, y, v):
-    r = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
-    b, t = TILE_COLORS.get(v, TILE_COLORS[1024])
-    draw_rounded(screen, b, r, 8)
-    pygame.draw.rect(screen, (255,255,255,50), r, 2, border_radius=8)
-    f_sz = 34 if v < 100 else 26
-    draw_text(str(v), r.centerx, r.centery, f_sz, t)
-    if v >= 512:
-         pygame.draw.rect(screen, (0,255,255), r.inflate(2,2), 2, border_radius=8)
+def draw_cell(x, y, v, surf=None):
+    (surf or screen).blit(board_tile(v), (x-1, y-1))
+
+def board_tile(v):
+    """Composed board tile with a 1px margin for the 512+ outline."""
+    def build():
+        s = pygame.Surface((TILE_SIZE+2, TILE_SIZE+2), pygame.SRCALPHA)
+        r = pygame.Rect(1, 1, TILE_SIZE, TILE_SIZE)
+        b, t = tile_colors(v)
+        draw_rounded(s, b, r, RADIUS)
+        if TILE_SIZE >= 12: # Below that outlines would cover the colour
+            # Opaque: the alpha was always dropped when drawing on the display
+            pygame.draw.rect(s, (255,255,255), r, 2, border_radius=RADIUS)
+        size = tile_font(v, 34 if v < 100 else 26)
+        if size >= 8:
+            tx = RC.text(v, size, t)
+            s.blit(tx, tx.get_rect(center=r.center))
+        if v >= 512 and TILE_SIZE >= 12:
+             pygame.draw.rect(s, (0,255,255), r.inflate(2,2), 2, border_radius=RADIUS)
+        return s
+    return RC.tile(("cell", v, TILE_SIZE), build)
+
+def falling_tile(v):
+    def build():
+        s = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+        r = s.get_rect()
+        bg, txt = tile_colors(v)
+        draw_rounded(s, bg, r, RADIUS)
+        if tile_font(v, 32) >= 8:
+            t = RC.text(v, tile_font(v, 32), txt)
+            s.blit(t, t.get_rect(center=r.center))
+        return s
+    return RC.tile(("fall", v, TILE_SIZE), build)
 
 def draw_overlay(title, sub, col):
     s = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
@@ -538,57 +712,240 @@ def draw_history_page(mx, my):
              draw_text(entry['date'][5:], 320, sy+20, 16, (150,150,150))
              sy += 50
 
+class LayeredRenderer:
+    """Play-screen renderer that only repaints regions whose inputs changed.
+
+    The static layer (panels, slots, header bar) and the board's tiles
+    come from the Tilemap, which repaints only the cells that changed.
+    Each frame compares a small key per screen
+    region with last frame's; regions whose key changed, or that FX
+    covered this frame or the last, are repainted and returned as the
+    dirty rects for pygame.display.update.
+    """
+    def __init__(self):
+        self.regions = screen_regions()
+        self.invalidate()
+
+    def invalidate(self):
+        """Repaint everything next frame (after menus or overlays)"""
+        self.keys = {}
+        self.fx_rect = None
+
+    def frame(self, frac=1.0):
+        T = tilemap()
+        mx, my = pygame.mouse.get_pos()
+        hov, f_hov = board_hover(mx, my), footer_hover(mx, my)
+        fx = G.fx.bounds()
+        if PROF.enabled: fx = fx.union(PROF.hud_rect) if fx else PROF.hud_rect # HUD repaints like FX
+        keys = {
+            "header": (G.score, G.gems, G.hist_mgr.get_best()),
+            "board": (G.gen, hov, tuple((b.x, b.draw_y(frac), b.val) for b in G.fallers)),
+            "spawner": (G.curr, G.next),
+            "footer": (G.gems, G.hammer_on, f_hov),
+        }
+        dirty = []
+        for name, r in self.regions.items():
+            if self.keys.get(name) == keys[name] and not (fx and r.colliderect(fx)) \
+               and not (self.fx_rect and r.colliderect(self.fx_rect)): continue
+            dirty.append(r)
+            t = PROF.now()
+            screen.set_clip(r)
+            if name == "board":
+                screen.blit(T.update(hov), r, r)
+                draw_fallers(screen, r, frac)
+            else:
+                screen.blit(T.static, r, r)
+                if name == "header": draw_header(screen)
+                elif name == "spawner": draw_spawner(screen)
+                else: draw_footer(screen, f_hov)
+            PROF.record(name, t)
+        screen.set_clip(None)
+        with PROF.span("fx.draw"): G.fx.draw(screen, frac)
+        self.keys, self.fx_rect = keys, fx
+        return dirty
+
 # --- LOOP ---
-while True:
-    G.update_logic()
-    
-    if G.state == "HISTORY": draw_history_page(*pygame.mouse.get_pos())
-    elif G.state == "MENU": 
-         draw_ui(); draw_menu(*pygame.mouse.get_pos()) # Re-draw BG then menu
-    else: draw_ui()
+
+class IdleScheduler:
+    """Frame pacing: full rate while animating, block on events when idle.
+
+    When nothing is moving (no fallers, particles, float texts or cascade
+    timers) the loop sleeps in pygame.event.wait until input arrives or
+    the timeout passes (so asset polling still runs). Without window focus
+    animations are throttled to background_fps. dt is the real time in ms
+    the simulation should advance by; idle sleeps don't count.
+    """
+    def __init__(self, fps=60, background_fps=10, idle_timeout_ms=1000):
+        self.fps = fps
+        self.background_fps = background_fps
+        self.idle_timeout_ms = idle_timeout_ms
+        self.focused = True
+        self.dt = 0
+
+    def animating(self):
+        return (G.state in ("FALL", "MERGE_WAIT", "GRAVITY_WAIT") or bool(G.fallers)
+                or len(G.fx.particles) > 0 or bool(G.fx.texts) or bool(G.hint_job) or G.view is not None)
+
+    def events(self, clock):
+        """Wait for the next frame and return the events that arrived"""
+        if self.animating():
+            self.dt = clock.tick(self.fps if self.focused else self.background_fps)
+            evs = pygame.event.get()
+        else:
+            e = pygame.event.wait(self.idle_timeout_ms)
+            evs = [] if e.type == pygame.NOEVENT else [e] + pygame.event.get()
+            clock.tick()
+            self.dt = 0
+        for e in evs:
+            if e.type == pygame.WINDOWFOCUSLOST: self.focused = False
+            elif e.type == pygame.WINDOWFOCUSGAINED: self.focused = True
+        return evs
+
+def draw_hud():
+    with PROF.span("hud"):
+        extra = f"fps {clock.get_fps():.0f}  particles {len(G.fx.particles)}  texts {len(G.fx.texts)}"
+        return PROF.draw_hud(screen, RC.text, extra)
+
+def startup_report(marks):
+    """One line of startup phase times from (name, perf_counter) marks."""
+    t, parts = T_START, []
+    for name, at in marks: parts.append(f"{name} {(at-t)*1000:.0f}"); t = at
+    return f"first frame {(t-T_START)*1000:.0f} ms after start: " + ", ".join(parts) + " ms"
+
+def main(fps=60, profile=False, startup=False):
+    global screen, clock, G
+    marks = [("imports", time.perf_counter())]
+    # Only what the game uses: pygame.init() would also open audio and joysticks
+    pygame.display.init(); pygame.font.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("2048: Fusion Pro")
+    ASSETS.preload()
+    clock = pygame.time.Clock()
+    marks.append(("display", time.perf_counter()))
+    G = GamePro()
+    R = LayeredRenderer()
+    marks.append(("game", time.perf_counter()))
+    G.hist_mgr # The header shows the best score from the first frame
+    marks.append(("history", time.perf_counter()))
+    S = IdleScheduler(fps)
+    acc = 0.0
+    if profile: PROF.toggle()
+    atexit.register(lambda: PROF.enabled and print("trace written to", PROF.dump()))
+
+    while True:
+        with PROF.span("poll"):
+            if ASSETS.poll(): R.invalidate() # Reloaded icons: the cached footer is stale
+            G.poll_hint()
+        # Fixed-rate sim: a slow frame runs several steps, a fast one none
+        acc += S.dt
+        steps = 0
+        while acc >= STEP_MS:
+            if steps == MAX_CATCHUP: acc = 0.0; break # Too far behind: drop it
+            with PROF.span("update_logic"): G.update_logic()
+            with PROF.span("fx.step"): G.fx.step()
+            acc -= STEP_MS; steps += 1
+        frac = acc / STEP_MS
     
-    pygame.display.flip()
-    clock.tick(60)
+        if G.state in ("IDLE", "FALL", "MERGE_WAIT", "GRAVITY_WAIT"):
+            dirty = R.frame(frac)
+            if PROF.enabled: dirty.append(draw_hud())
+            with PROF.span("display.update"): pygame.display.update(dirty)
+        else:
+            if G.state == "HISTORY": draw_history_page(*pygame.mouse.get_pos())
+            elif G.state == "MENU": 
+                 draw_ui(frac); draw_menu(*pygame.mouse.get_pos()) # Re-draw BG then menu
+            else: draw_ui(frac)
+            if PROF.enabled: draw_hud()
+            with PROF.span("display.flip"): pygame.display.flip()
+            R.invalidate()
+        if marks:
+            marks.append(("draw", time.perf_counter()))
+            print(startup_report(marks), file=sys.stderr)
+            if startup: return
+            marks = None
     
-    for e in pygame.event.get():
-        if e.type == pygame.QUIT:
-             G.end_game(); sys.exit()
+        PROF.frame_end()
+        evs = S.events(clock)
+        PROF.frame_begin()
+        t = PROF.now()
+        for e in evs:
+            if e.type == pygame.QUIT:
+                 G.end_game(); sys.exit()
+
+            if e.type == pygame.KEYDOWN:
+                # F3 profiler HUD, F12 dump its trace
+                if e.key == pygame.K_F3: PROF.toggle(); R.invalidate()
+                elif e.key == pygame.K_F12 and PROF.enabled: G.fx.add_msg("TRACE SAVED", WIDTH//2, HEIGHT-200, C_WHITE); PROF.dump()
+
+            if e.type == pygame.KEYDOWN and G.state == "IDLE":
+                # Ctrl+Z undo, Ctrl+Y / Ctrl+Shift+Z redo, H hint, T turbo
+                if not e.mod & pygame.KMOD_CTRL:
+                    if e.key == pygame.K_h: G.request_hint()
+                    elif e.key == pygame.K_t: G.toggle_turbo()
+                elif e.key == pygame.K_y or (e.key == pygame.K_z and e.mod & pygame.KMOD_SHIFT): G.redo_state()
+                elif e.key == pygame.K_z: G.restore_state()
              
-        if e.type == pygame.MOUSEBUTTONDOWN:
-            mx, my = pygame.mouse.get_pos()
+            if e.type == pygame.MOUSEBUTTONDOWN:
+                mx, my = pygame.mouse.get_pos()
             
-            if G.state == "MENU":
-                box_x = (WIDTH-280)//2; box_y = (HEIGHT-350)//2
-                opts = ["RESUME", "RESTART", "📜 HISTORY", "QUIT"]
-                oy = box_y + 100
-                for o in opts:
-                    if pygame.Rect(box_x+40, oy, 200, 45).collidepoint(mx, my):
-                        if o=="RESUME": G.state = "IDLE"
-                        elif o=="RESTART": G.reset()
-                        elif o=="QUIT": G.end_game(); sys.exit()
-                        elif o=="📜 HISTORY": G.state = "HISTORY"
-                    oy+=60
-                continue
+                if G.state == "MENU":
+                    box_x = (WIDTH-280)//2; box_y = (HEIGHT-350)//2
+                    opts = ["RESUME", "RESTART", "📜 HISTORY", "QUIT"]
+                    oy = box_y + 100
+                    for o in opts:
+                        if pygame.Rect(box_x+40, oy, 200, 45).collidepoint(mx, my):
+                            if o=="RESUME": G.state = "IDLE"
+                            elif o=="RESTART": G.reset()
+                            elif o=="QUIT": G.end_game(); sys.exit()
+                            elif o=="📜 HISTORY": G.state = "HISTORY"
+                        oy+=60
+                    continue
             
-            if G.state == "HISTORY":
-                 if pygame.Rect(20, 30, 80, 40).collidepoint(mx, my): G.state = "MENU"
-                 continue
+                if G.state == "HISTORY":
+                     if pygame.Rect(20, 30, 80, 40).collidepoint(mx, my): G.state = "MENU"
+                     continue
 
-            if pygame.Rect(WIDTH-60, 30, 45, 45).collidepoint(mx,my):
-                G.state = "MENU"; continue
+                if pygame.Rect(WIDTH-60, 30, 45, 45).collidepoint(mx,my):
+                    G.settle(); G.state = "MENU"; continue
             
-            bx = (WIDTH - (3*70+40))//2; by = HEIGHT - 110
-            if pygame.Rect(bx, by, 70, 70).collidepoint(mx,my):
-                 if G.gems>=10: G.hammer_on = not G.hammer_on
-            elif pygame.Rect(bx+90, by, 70, 70).collidepoint(mx,my): G.action_swap()
-            elif pygame.Rect(bx+180, by, 70, 70).collidepoint(mx,my): G.restore_state()
+                bx = (WIDTH - (3*70+40))//2; by = HEIGHT - 110
+                if pygame.Rect(bx, by, 70, 70).collidepoint(mx,my):
+                     if G.gems>=10: G.hammer_on = not G.hammer_on
+                elif pygame.Rect(bx+90, by, 70, 70).collidepoint(mx,my): G.action_swap()
+                elif pygame.Rect(bx+180, by, 70, 70).collidepoint(mx,my): G.restore_state()
             
-            if G.state == "IDLE":
-                if BOARD_X<=mx<=BOARD_X+BOARD_W and BOARD_Y<=my<=BOARD_Y+BOARD_H:
-                    c = (mx - BOARD_X) // (TILE_SIZE+GAP)
-                    if 0<=c<COLS:
-                         if G.hammer_on:
-                             r = (my - BOARD_Y)//(TILE_SIZE+GAP)
-                             if 0<=r<ROWS: G.action_hammer(r, c)
-                         else:
-                             G.action_drop(c)
\ No newline at end of file
+                if G.state == "IDLE":
+                    if BOARD_X<=mx<=BOARD_X+BOARD_W and BOARD_Y<=my<=BOARD_Y+BOARD_H:
+                        c = (mx - BOARD_X) // (TILE_SIZE+GAP)
+                        if 0<=c<COLS:
+                             if G.hammer_on:
+                                 r = (my - BOARD_Y)//(TILE_SIZE+GAP)
+                                 if 0<=r<ROWS: G.action_hammer(r, c)
+                             else:
+                                 G.action_drop(c)
+        PROF.record("events", t)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="2048: Fusion Pro")
+    ap.add_argument("--fps", type=int, default=60, help="render rate cap, e.g. 120 or 144 (sim stays at %d Hz)" % SIM_HZ)
+    ap.add_argument("--profile", action="store_true", help="start with the F3 profiler on; its trace is saved on exit")
+    ap.add_argument("--rows", type=int, default=ROWS)
+    ap.add_argument("--cols", type=int, default=COLS)
+    ap.add_argument("--size", default=f"{WIDTH}x{HEIGHT}", help="window WxH, e.g. 1600x1000 for a 64x128 board")
+    ap.add_argument("--spawn", default=",".join(map(str, SPAWN_VALUES)),
+                    help="tiles new drops are picked from, repeats weight them (default %(default)s)")
+    ap.add_argument("--turbo", action="store_true", help="resolve cascades at once and play them back (T toggles)")
+    ap.add_argument("--speed", type=float, default=SPEED, help="animation speed multiplier, e.g. 2 for twice as fast")
+    ap.add_argument("--startup", action="store_true", help="quit after the first frame, to time cold starts")
+    args = ap.parse_args()
+    if args.speed <= 0: ap.error("--speed must be positive")
+    SPEED, TURBO = args.speed, args.turbo
+    try:
+        w, h = map(int, args.size.lower().split("x"))
+        spawn = [int(v) for v in args.spawn.split(",")]
+    except ValueError: ap.error("bad --size or --spawn")
+    if not (0 < args.rows < 256 and 0 < args.cols < 256): ap.error("rows and cols must be 1..255")
+    if any(v < 2 or v & (v-1) for v in spawn): ap.error("spawn tiles must be powers of two")
+    configure(args.rows, args.cols, w, h, spawn)
+    main(fps=args.fps, profile=args.profile, startup=args.startup)
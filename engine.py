@@ -0,0 +1,219 @@
+"""Drop Merge 2048 rules with no pygame dependency.
+
+The renderer in drop_merge_2048.py animates on top of this; simulators,
+bots and tests can drive an Engine directly:
+
+    g = Engine()
+    if g.drop(2) >= 0:
+        ev = g.step()   # whole fall -> merge -> gravity cascade
+"""
+import random
+from collections import namedtuple
+
+from groups import MergeDetector
+from undo import Snapshot, UndoHistory, pack_board, unpack_board
+from actions import ActionLog, DROP, SWAP, HAMMER, UNDO, REDO
+
+COLS, ROWS = 5, 7
+SPAWN_VALUES = (2, 2, 4, 4, 8, 8, 16)
+START_GEMS = 20
+GEM_TILE, GEM_BONUS = 512, 2
+SWAP_COST, HAMMER_COST, UNDO_COST = 2, 10, 5
+UNDO_DEPTH = None # Unlimited; the history's memory budget still applies
+
+_M64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+
+def spawn_index(seed, n, k=len(SPAWN_VALUES)):
+    """Index of the n-th spawn for seed: splitmix64(seed + (n+1)*golden) % k.
+
+    Counter based, so batch.py can compute the same stream with array ops.
+    """
+    z = (seed + (n+1)*GOLDEN) & _M64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _M64
+    return (z ^ (z >> 31)) % k
+
+
+class SpawnStream:
+    """Seeded stand-in for the random module's choice() used by rnd()."""
+    def __init__(self, seed):
+        self.seed = seed & _M64
+        self.n = 0
+
+    def choice(self, seq):
+        i = spawn_index(self.seed, self.n, len(seq))
+        self.n += 1
+        return seq[i]
+
+
+# Result of Engine.step(): a list of merge waves (one list of Merge per
+# pass, gravity runs between passes), score and gem deltas, game over flag.
+Step = namedtuple("Step", "waves score gems over")
+
+
+def gravity(board, rows, cols, columns=None):
+    """Let tiles fall to the bottom of their column (of the given columns).
+
+    Returns the cells that received a different tile (empty if none moved).
+    """
+    moved = []
+    for c in (range(cols) if columns is None else sorted(columns)):
+        col_dat = [board[r][c] for r in range(rows) if board[r][c]!=0]
+        new_col = [0]*(rows-len(col_dat)) + col_dat
+        for r in range(rows):
+            if board[r][c] != new_col[r]:
+                board[r][c] = new_col[r]
+                if new_col[r]: moved.append((r,c))
+    return moved
+
+
+class Engine:
+    """Board, queue, gems and undo for one game. Pure logic, no timers.
+
+    Code that writes self.board directly should tell self.detect
+    (touch/touch_all) so incremental merge detection sees the change, and
+    add any column it leaves a gap in to self.holes for apply_gravity.
+    With a seed, spawns come from SpawnStream and every successful move
+    is recorded in self.log, so (seed, log) replays the game exactly.
+    """
+    def __init__(self, rows=ROWS, cols=COLS, rng=None, incremental=True, seed=None, undo_depth=UNDO_DEPTH,
+                 spawn=SPAWN_VALUES):
+        self.rows, self.cols = rows, cols
+        self.spawn = tuple(spawn)
+        if not self.spawn or any(v < 2 or v & (v-1) for v in self.spawn):
+            raise ValueError(f"spawn tiles must be powers of two, not {self.spawn}")
+        self.undo_depth = undo_depth
+        self.seed = seed
+        if seed is not None: rng = SpawnStream(seed)
+        self.rng = rng if rng is not None else random
+        self.detect = MergeDetector(rows, cols, incremental)
+        self.reset()
+
+    def reset(self, seed=None):
+        """New game; a seed restarts the spawn stream from it."""
+        if seed is not None: self.seed, self.rng = seed, SpawnStream(seed)
+        self.board = [[0]*self.cols for _ in range(self.rows)]
+        self.detect.clear()
+        self.holes = set() # Columns that may have gaps for apply_gravity
+        self.score = 0
+        self.gems = START_GEMS
+        self.curr = self.rnd()
+        self.next = self.rnd()
+        self.history = UndoHistory(self.undo_depth)
+        self.log = ActionLog()
+        self.over = False
+
+    def rnd(self): return self.rng.choice(self.spawn)
+
+    # --- undo ---
+
+    def snapshot(self):
+        return Snapshot(pack_board(self.board), self.score, self.gems, self.curr, self.next)
+
+    def restore(self, st):
+        """Load a snapshot as is (no undo fee)."""
+        self.board = unpack_board(st.board, self.rows, self.cols)
+        self.detect.touch_all()
+        self.holes = set()
+        self.score, self.gems, self.curr, self.next = st.score, st.gems, st.curr, st.next
+
+    def save_state(self): self.history.push(self.snapshot())
+
+    def undo(self):
+        if self.gems < UNDO_COST or not self.history.can_undo: return False
+        self.restore(self.history.undo(self.snapshot()))
+        self.gems -= UNDO_COST
+        self.log.add(UNDO)
+        return True
+
+    def redo(self):
+        """Replay an undone move. Free, but the undo fee stays spent."""
+        if not self.history.can_redo: return False
+        self.restore(self.history.redo(self.snapshot()))
+        self.gems -= UNDO_COST
+        self.log.add(REDO)
+        return True
+
+    # --- actions ---
+
+    def check_cell(self, r, c):
+        """Raise IndexError unless (r, c) is on the board (negative indexes would wrap)."""
+        if not (0 <= r < self.rows and 0 <= c < self.cols): raise IndexError(f"cell ({r}, {c}) is off the board")
+
+    def landing_row(self, col):
+        self.check_cell(0, col)
+        for r in range(self.rows-1, -1, -1):
+            if self.board[r][col] == 0: return r
+        return -1
+
+    def drop(self, col):
+        """Put the current tile on top of col. Returns its row, -1 if full.
+
+        Only places the tile; call step() to resolve the cascade.
+        """
+        self.check_cell(0, col)
+        if self.over: return -1
+        lr = self.landing_row(col)
+        if lr == -1: return -1
+        self.save_state()
+        self.board[lr][col] = self.curr
+        self.detect.touch(lr, col)
+        self.curr = self.next
+        self.next = self.rnd()
+        self.log.add(DROP, col)
+        return lr
+
+    def swap(self):
+        if self.gems < SWAP_COST: return False
+        self.save_state()
+        self.gems -= SWAP_COST
+        self.curr, self.next = self.next, self.curr
+        self.log.add(SWAP)
+        return True
+
+    def hammer(self, r, c):
+        """Smash one tile and let its column settle (no merge pass)."""
+        self.check_cell(r, c)
+        if self.gems < HAMMER_COST or self.board[r][c] == 0: return False
+        self.save_state()
+        self.gems -= HAMMER_COST
+        self.board[r][c] = 0
+        self.holes.add(c)
+        self.apply_gravity()
+        self.log.add(HAMMER, r*self.cols + c)
+        return True
+
+    # --- resolution ---
+
+    def check_merges(self):
+        merges = self.detect.scan(self.board)
+        for m in merges:
+            self.holes.update(c for _, c in m.cells)
+            self.score += m.new_val
+            if m.new_val == GEM_TILE: self.gems += GEM_BONUS
+        return merges
+
+    def apply_gravity(self):
+        moved = gravity(self.board, self.rows, self.cols, self.holes)
+        self.holes = set()
+        self.detect.touch_cells(moved)
+        return moved
+
+    def check_loss(self):
+        return all(self.board[0])
+
+    def step(self):
+        """Resolve a dropped tile: loss check, then merge/gravity until stable."""
+        score, gems = self.score, self.gems
+        waves = []
+        if self.check_loss():
+            self.over = True
+        else:
+            while True:
+                merges = self.check_merges()
+                if not merges: break
+                waves.append(merges)
+                self.apply_gravity()
+        return Step(waves, self.score-score, self.gems-gems, self.over)
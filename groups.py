@@ -0,0 +1,202 @@
+"""Merge-group detection with union-find, optionally incremental.
+
+A merge pass only has work where two equal tiles touch. A settled board
+has no such pairs, and a drop, gravity or merge can only create them next
+to the cells it changed, so the detector keeps a set of dirty cells and,
+in incremental mode, only unions the equal edges touching those. Full mode
+labels every edge of the board in one pass instead.
+
+Either way the result is identical to merge_scan, the plain ordered scan
+that defines the rules and serves as the fallback for rare passes.
+"""
+from collections import namedtuple
+from heapq import heappop, heappush
+
+NEIGHBOURS = ((0,1), (0,-1), (1,0), (-1,0))
+
+# One merged group: cells in discovery order, the cell that keeps the tile,
+# the old value and the doubled value.
+Merge = namedtuple("Merge", "cells anchor val new_val")
+
+
+def bfs_group(board, r, c, val, rows, cols):
+    """Cells connected to (r, c) holding val, in discovery order."""
+    stack = [(r,c)]
+    grp = []
+    seen = set()
+    while stack:
+        curr = stack.pop()
+        if curr in seen: continue
+        seen.add(curr)
+        grp.append(curr)
+        for dr, dc in NEIGHBOURS:
+            nr, nc = curr[0]+dr, curr[1]+dc
+            if 0<=nr<rows and 0<=nc<cols and board[nr][nc]==val:
+                stack.append((nr,nc))
+    return grp
+
+
+def merge_scan(board, rows, cols, start=0, visited=None):
+    """One merge pass over board, in place. Returns the list of Merge.
+
+    Cells are scanned bottom row first, left to right; scan position k is
+    (rows-1-r)*cols + c and the pass can be resumed from `start`. Every
+    group of two or more equal tiles collapses into its lowest cell (first
+    discovered on ties) with double the value.
+    """
+    if visited is None: visited = set()
+    merges = []
+    for k in range(start, rows*cols):
+        r, c = rows-1 - k//cols, k % cols
+        val = board[r][c]
+        if val == 0 or (r,c) in visited: continue
+        group = bfs_group(board, r, c, val, rows, cols)
+        if len(group) < 2: continue
+        anchor = max(group, key=lambda x: x[0])
+        new_val = val*2
+        for cell in group:
+            visited.add(cell)
+            board[cell[0]][cell[1]] = 0
+        board[anchor[0]][anchor[1]] = new_val
+        merges.append(Merge(group, anchor, val, new_val))
+    return merges
+
+
+class UnionFind:
+    """Sparse disjoint sets over hashable keys."""
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        p = self.parent
+        p.setdefault(x, x)
+        while p[x] != x:
+            p[x] = p[p[x]]
+            x = p[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb: self.parent[ra] = rb
+
+    def groups(self):
+        out = {}
+        for x in self.parent:
+            out.setdefault(self.find(x), []).append(x)
+        return out.values()
+
+
+class MergeDetector:
+    """Runs merge passes over a list board, tracking which cells changed.
+
+    Callers touch() cells they write; anything that rewrites the whole
+    board (undo, loading a position) calls touch_all().
+    """
+    def __init__(self, rows, cols, incremental=True):
+        self.rows, self.cols = rows, cols
+        self.incremental = incremental
+        self.dirty = set()
+        self.all_dirty = False
+
+    def touch(self, r, c): self.dirty.add((r,c))
+
+    def touch_cells(self, cells): self.dirty.update(cells)
+
+    def touch_all(self): self.all_dirty = True
+
+    def clear(self):
+        self.dirty = set()
+        self.all_dirty = False
+
+    def _label(self, board, dirty=None):
+        rows, cols = self.rows, self.cols
+        uf = UnionFind()
+        if dirty is None and self.incremental and not self.all_dirty: dirty = self.dirty
+        if dirty is not None:
+            for r, c in dirty:
+                v = board[r][c]
+                if v == 0: continue
+                for dr, dc in NEIGHBOURS:
+                    nr, nc = r+dr, c+dc
+                    if 0<=nr<rows and 0<=nc<cols and board[nr][nc]==v:
+                        uf.union((r,c), (nr,nc))
+        else:
+            for r in range(rows):
+                row = board[r]
+                below = board[r+1] if r+1 < rows else None
+                for c in range(cols):
+                    v = row[c]
+                    if v == 0: continue
+                    if c+1 < cols and row[c+1] == v: uf.union((r,c), (r,c+1))
+                    if below is not None and below[c] == v: uf.union((r,c), (r+1,c))
+        return uf.groups()
+
+    def scan(self, board):
+        """One merge pass in place; same result as merge_scan(board, ...)."""
+        rows, cols = self.rows, self.cols
+        key = lambda cell: (rows-1-cell[0])*cols + cell[1]
+        dirty = None if not self.incremental or self.all_dirty else self.dirty
+        groups = sorted((min(map(key, g)), g) for g in self._label(board))
+        self.clear()
+        merges = []
+        visited = set()
+        for k, group in groups:
+            r, c = anchor = rows-1 - k//cols, k % cols
+            val = board[r][c]
+            new_val = val*2
+            for cr, cc in group: board[cr][cc] = 0
+            board[r][c] = new_val
+            visited.update(group)
+            merges.append(Merge(group, anchor, val, new_val))
+            self.dirty.add(anchor)
+            # A doubled anchor touching its new value could be pulled into a
+            # later group by the ordered scan: finish the pass group by group.
+            for dr, dc in NEIGHBOURS:
+                nr, nc = r+dr, c+dc
+                if 0<=nr<rows and 0<=nc<cols and board[nr][nc]==new_val:
+                    return merges + self._resume(board, k, visited, dirty)
+        return merges
+
+    def _resume(self, board, k, visited, dirty):
+        """Rest of a pass after scan position k, like merge_scan(board, ...,
+        k+1, visited) but only trying cells where the scan could start a group.
+
+        The scan starts a group at a cell with an equal neighbour. That pair
+        was either on the board when the pass began, so it touches a dirty
+        cell, or it was made by an anchor of this pass. Those cells wait on
+        a heap by scan position, and each new anchor pushes its equal pairs.
+        Full mode (dirty None) just finishes with merge_scan.
+        """
+        rows, cols = self.rows, self.cols
+        if dirty is None:   # Every cell is a candidate: the plain scan is cheapest
+            merges = merge_scan(board, rows, cols, k+1, visited)
+            self.dirty.update(m.anchor for m in merges)
+            return merges
+        heap = []
+        def push_pairs(r, c):
+            v = board[r][c]
+            if v == 0: return
+            for dr, dc in NEIGHBOURS:
+                nr, nc = r+dr, c+dc
+                if 0<=nr<rows and 0<=nc<cols and board[nr][nc]==v:
+                    heappush(heap, ((rows-1-r)*cols + c, r, c))
+                    heappush(heap, ((rows-1-nr)*cols + nc, nr, nc))
+        for r, c in set(dirty) | self.dirty: push_pairs(r, c)
+        merges = []
+        while heap:
+            s, r, c = heappop(heap)
+            if s <= k or (r, c) in visited: continue
+            val = board[r][c]
+            if val == 0: continue
+            group = bfs_group(board, r, c, val, rows, cols)
+            if len(group) < 2: continue
+            k = s
+            anchor = max(group, key=lambda x: x[0])
+            for cell in group:
+                visited.add(cell)
+                board[cell[0]][cell[1]] = 0
+            board[anchor[0]][anchor[1]] = val*2
+            merges.append(Merge(group, anchor, val, val*2))
+            self.dirty.add(anchor)
+            push_pairs(*anchor)
+        return merges
@@ -0,0 +1,201 @@
+"""Move search for hints and a headless bot.
+
+Expectimax over packed bitboards: the player picks a column (optionally
+after a swap), then the spawn of the tile after next averages over
+the spawn distribution (SPAWN_VALUES unless given). Positions are keyed by (bits, curr, next, gems that still
+matter, depth) in a transposition table kept between searches. Searches
+deepen one ply at a time until the millisecond budget runs out and return
+the best move of the deepest finished ply.
+
+    best_move(engine.bits, engine.curr, engine.next, engine.gems, budget_ms=100)
+
+Given a process pool, the root moves of each ply are searched in parallel.
+`python hint.py` plays games with the bot and prints their scores.
+"""
+import time
+from collections import Counter, namedtuple
+
+from bitboard import BitEngine, layout, merge_pass, settle
+from engine import ROWS, COLS, SPAWN_VALUES, SWAP_COST, GEM_TILE, GEM_BONUS
+
+
+def spawn_p(spawn):
+    """((value, probability), ...) of a spawn list."""
+    return tuple((v, n/len(spawn)) for v, n in sorted(Counter(spawn).items()))
+
+
+SPAWN_P = spawn_p(SPAWN_VALUES)
+LOSS = -1e6
+EMPTY_W = 16       # leaf value per empty cell
+GEM_W = 4          # value per gem gained
+TT_SIZE = 1 << 18  # entries before the table is cleared
+
+# One root move: swap first or not, then drop in col.
+Move = namedtuple("Move", "col swap value depth")
+
+
+class Timeout(Exception):
+    pass
+
+
+def play(bits, L, col, val):
+    """Drop val in col and run the cascade: (bits, score, gems), or None if
+    col is full. A lost game comes back with score LOSS."""
+    cs = L.col_bits*col
+    free = L.col_ones & ~L.nz((bits >> cs) & L.col_mask)
+    if not free: return None
+    bits |= (val.bit_length()-1) << (cs + ((free & -free).bit_length()-1))
+    if L.nz(bits) & L.top == L.top: return bits, LOSS, 0
+    score = gems = 0
+    while True:
+        try: bits, merges = merge_pass(bits, L, cells=False)
+        except OverflowError: return bits, 0, 0   # Past the 4-bit tiles: stop here
+        if not merges: return bits, score, gems
+        for m in merges:
+            score += m.new_val
+            if m.new_val == GEM_TILE: gems += GEM_BONUS
+        bits = settle(bits, L)[0]
+
+
+def evaluate(bits, L):
+    return EMPTY_W * (L.cells - bin(L.nz(bits)).count("1"))
+
+
+class Searcher:
+    def __init__(self, rows=ROWS, cols=COLS, spawn=SPAWN_VALUES):
+        self.L = layout(rows, cols)
+        self.spawn_p = spawn_p(spawn)
+        self.tt = {}
+        self.nodes = 0
+        self.deadline = None
+
+    def moves(self, curr, nxt, gems):
+        """(swap, tile to drop, tile left as next, gems after)."""
+        out = [(False, curr, nxt, gems)]
+        if nxt is not None and nxt != curr and gems >= SWAP_COST: out.append((True, nxt, curr, gems - SWAP_COST))
+        return out
+
+    def value(self, bits, curr, nxt, gems, depth):
+        """Expected score from here over depth more drops (plus leaf value)."""
+        if depth == 0: return evaluate(bits, self.L)
+        if nxt is None:
+            # The tile after next only matters to a swap or a deeper drop
+            if depth == 1 and gems < SWAP_COST:
+                return self.best(bits, curr, None, gems, depth)[0]
+            return sum(p*self.value(bits, curr, v, gems, depth) for v, p in self.spawn_p)
+        key = (bits, curr, nxt, min(gems, SWAP_COST*depth), depth)
+        hit = self.tt.get(key)
+        if hit is not None: return hit
+        v = self.best(bits, curr, nxt, gems, depth)[0]
+        if len(self.tt) >= TT_SIZE: self.tt.clear()
+        self.tt[key] = v
+        return v
+
+    def best(self, bits, curr, nxt, gems, depth):
+        """(value, col, swap) of the best move; col -1 if none is legal."""
+        self.nodes += 1
+        if self.deadline is not None and time.perf_counter() > self.deadline: raise Timeout
+        top = (LOSS*2, -1, False)
+        for swap, tile, left, g in self.moves(curr, nxt, gems):
+            for col in range(self.L.cols):
+                r = self.score_move(bits, col, tile, left, g, depth)
+                if r is not None and r > top[0]: top = (r, col, swap)
+        return top
+
+    def score_move(self, bits, col, tile, left, gems, depth):
+        res = play(bits, self.L, col, tile)
+        if res is None: return None
+        bits, score, gained = res
+        if score == LOSS: return LOSS
+        return score + GEM_W*gained + self.value(bits, left, None, gems + gained, depth-1)
+
+    def search(self, bits, curr, nxt, gems, budget_ms=100, max_depth=8):
+        """Iterative deepening under budget_ms. Returns the best Move."""
+        self.deadline = time.perf_counter() + budget_ms/1000
+        found = None
+        try:
+            for depth in range(1, max_depth+1):
+                v, col, swap = self.best(bits, curr, nxt, gems, depth)
+                if col < 0: break
+                found = Move(col, swap, v, depth)
+        except Timeout: pass
+        finally: self.deadline = None
+        return found
+
+
+_SEARCHERS = {}
+
+
+def searcher(rows, cols, spawn=SPAWN_VALUES):
+    """This process's Searcher for the board shape and spawns."""
+    key = (rows, cols, tuple(spawn))
+    s = _SEARCHERS.get(key)
+    if s is None: s = _SEARCHERS[key] = Searcher(*key)
+    return s
+
+
+def _root(args):
+    """Worker: value of one root move at depth, None if illegal, Timeout
+    if the deadline passed."""
+    bits, rows, cols, spawn, col, swap, curr, nxt, gems, depth, deadline = args
+    s = searcher(rows, cols, spawn)
+    tile, left = (nxt, curr) if swap else (curr, nxt)
+    s.deadline = deadline
+    try: return s.score_move(bits, col, tile, left, gems - SWAP_COST*swap, depth)
+    except Timeout: return Timeout
+    finally: s.deadline = None
+
+
+def best_move(bits, curr, nxt, gems, budget_ms=100, rows=ROWS, cols=COLS, pool=None, max_depth=8,
+              spawn=SPAWN_VALUES):
+    """Best Move for the position, or None if no column is open. Searches
+    in this process, or splits each ply's root moves over pool (a
+    ProcessPoolExecutor); either way tables persist between calls."""
+    if pool is None: return searcher(rows, cols, spawn).search(bits, curr, nxt, gems, budget_ms, max_depth)
+    deadline = time.perf_counter() + budget_ms/1000
+    roots = [(c, sw) for sw in (False, True) if not sw or (nxt != curr and gems >= SWAP_COST) for c in range(cols)]
+    found = None
+    for depth in range(1, max_depth+1):
+        res = list(pool.map(_root, [(bits, rows, cols, spawn, c, sw, curr, nxt, gems, depth, deadline) for c, sw in roots]))
+        if Timeout in res: break
+        legal = [(v, m) for v, m in zip(res, roots) if v is not None]
+        if not legal: break
+        v, (col, swap) = max(legal)
+        found = Move(col, swap, v, depth)
+    return found
+
+
+def play_game(seed, budget_ms=20, rows=ROWS, cols=COLS, pool=None, max_moves=None):
+    """One bot game on BitEngine. Returns (score, moves)."""
+    g = BitEngine(rows, cols, seed=seed)
+    while not g.over and (max_moves is None or len(g.log) < max_moves):
+        m = best_move(g.bits, g.curr, g.next, g.gems, budget_ms, rows, cols, pool)
+        if m is None: break
+        if m.swap: g.swap()
+        g.drop(m.col); g.step()
+    return g.score, len(g.log)
+
+
+def main(argv=None):
+    import argparse   # CLI only: the game imports this module at startup
+    from concurrent.futures import ProcessPoolExecutor
+    ap = argparse.ArgumentParser(description="Play Drop Merge 2048 with the hint search")
+    ap.add_argument("--games", type=int, default=10)
+    ap.add_argument("--budget", type=float, default=10, help="ms per move")
+    ap.add_argument("--max-moves", type=int, default=2000, help="stop a game after this many moves")
+    ap.add_argument("--workers", type=int, default=0, help="search processes (0 = search in this one)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    pool = ProcessPoolExecutor(args.workers) if args.workers else None
+    scores = []
+    t0 = time.perf_counter()
+    for i in range(args.games):
+        score, moves = play_game(args.seed + i, args.budget, pool=pool, max_moves=args.max_moves)
+        scores.append(score)
+        print(f"game {i}: score {score} in {moves} moves")
+    if pool: pool.shutdown()
+    print(f"mean {sum(scores)/len(scores):.0f}, best {max(scores)}, {time.perf_counter()-t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Append-only binary files: a magic/version header, then records.
+
+record.dat (scores.py), replays.dat (actions.py) and results.dat
+(tournament.py) start with the same header:
+
+    header   8s magic, H version, 6x pad     16 bytes
+
+Records are only ever appended. A crash can at worst leave part of a
+record at the end of the file, so readers stop at the last whole record
+and open_append() truncates the torn tail before writing the next one.
+Whole-file rewrites go through write_file(), which replaces the file
+atomically, and a file whose header is wrong is renamed aside by
+set_aside() instead of being written over. dataset.py has a longer header of its own but the same tail
+rule, through whole().
+"""
+import os
+import struct
+
+HEADER = struct.Struct("<8sH6x")
+
+
+def whole(size, start, width):
+    """End of the last whole width-byte record in a file of size bytes
+    whose records begin at start."""
+    return start + max(size - start, 0) // width * width
+
+
+def check(head, magic, versions, what):
+    """Version in the header bytes head. Raises ValueError unless it is a
+    `what` file at one of versions."""
+    if len(head) < HEADER.size: raise ValueError(f"not a {what}")
+    m, version = HEADER.unpack_from(head)
+    if m != magic: raise ValueError(f"not a {what}")
+    if version not in versions: raise ValueError(f"{what} version {version} is not supported")
+    return version
+
+
+def read_file(path, magic, versions, what):
+    """(version, contents) of path. Raises ValueError if it isn't a `what`."""
+    with open(path, "rb") as f: data = f.read()
+    return check(data, magic, versions, what), data
+
+
+def sync_dir(path):
+    """fsync the directory holding path, so a rename in it is durable."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try: os.fsync(fd)
+        finally: os.close(fd)
+    except OSError: pass   # Directory fsync isn't supported everywhere (Windows)
+
+
+def set_aside(path):
+    """Rename a file that can't be read as a log to path.bad (path.bad.1, ...
+    if taken) rather than overwrite it. Returns the new name."""
+    bad, n = path + ".bad", 0
+    while os.path.exists(bad): n += 1; bad = f"{path}.bad.{n}"
+    os.replace(path, bad)
+    sync_dir(path)
+    return bad
+
+
+def write_file(path, magic, version, body):
+    """Atomically replace path with a header and body."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(magic, version))
+        f.write(body)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+    sync_dir(path)
+
+
+def open_append(path, magic, version, what, width=None, good_end=None):
+    """path opened "r+b" at the end of its last whole record, ready to
+    append. A missing file, or one too short to hold a header, gets a fresh
+    header. Otherwise the header must be a `what` at version (ValueError if
+    not) and the file is cut back to whole(size, HEADER.size, width) for
+    fixed-width records, or to good_end(f, size) for any other layout."""
+    try: f = open(path, "r+b")
+    except FileNotFoundError: f = open(path, "w+b")
+    try:
+        head = f.read(HEADER.size)
+        size = f.seek(0, os.SEEK_END)
+        if size < HEADER.size:
+            f.truncate(0); f.seek(0)
+            f.write(HEADER.pack(magic, version))
+            return f
+        check(head, magic, (version,), what)
+        end = whole(size, HEADER.size, width) if width else good_end(f, size)
+        if end != size: f.truncate(end)   # Torn final record
+        f.seek(end)
+        return f
+    except BaseException:
+        f.close()
+        raise
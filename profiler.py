@@ -0,0 +1,126 @@
+"""Frame profiler: timed spans, an on-screen HUD and Chrome trace export.
+
+Code marks work with `with PROF.span("name"):` (or now()/record() around
+a block that can't be indented). While the profiler is off, span() hands
+back one shared no-op context, so the instrumentation can stay in the
+main loop. While it is on, every span goes to a ring buffer as
+(name, start ns, duration ns) and the time between frame_begin() and
+frame_end() goes to a window of recent frames. The HUD shows percentiles
+and a histogram of those frame times, plus the most expensive spans of
+the last frame. dump() writes the ring buffer as Chrome trace_event JSON
+for chrome://tracing or Perfetto.
+"""
+import json
+import os
+import time
+from collections import deque
+
+import pygame
+
+HIST_MS = (1, 2, 4, 8, 16, 33)   # histogram bucket upper bounds; the last bucket is open
+
+
+class _Span:
+    __slots__ = ("prof", "name", "t0")
+
+    def __init__(self, prof, name):
+        self.prof, self.name = prof, name
+
+    def __enter__(self): self.t0 = time.perf_counter_ns()
+
+    def __exit__(self, *exc): self.prof.record(self.name, self.t0)
+
+
+class _Null:
+    def __enter__(self): pass
+    def __exit__(self, *exc): pass
+
+
+_NULL = _Null()
+
+
+class Profiler:
+    def __init__(self, capacity=1 << 16, window=600, hud_rect=(5, 5, 230, 150)):
+        self.enabled = False
+        self.spans = deque(maxlen=capacity)
+        self.frames = deque(maxlen=window)   # busy ms per frame
+        self.cur, self.last = {}, {}         # span name -> ms this / last frame
+        self.hud_rect = pygame.Rect(hud_rect)
+        self.t_frame = None
+        self.pid = os.getpid()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.frames.clear()
+        self.t_frame = None
+
+    @staticmethod
+    def now(): return time.perf_counter_ns()
+
+    def span(self, name):
+        return _Span(self, name) if self.enabled else _NULL
+
+    def record(self, name, t0):
+        """Close a span that started at t0 (from now())."""
+        if not self.enabled: return
+        dur = time.perf_counter_ns() - t0
+        self.spans.append((name, t0, dur))
+        self.cur[name] = self.cur.get(name, 0) + dur/1e6
+
+    def frame_begin(self):
+        if self.enabled: self.t_frame = time.perf_counter_ns()
+
+    def frame_end(self):
+        """Close the frame opened by frame_begin (waiting happens between)."""
+        if not self.enabled or self.t_frame is None: return
+        self.record("frame", self.t_frame)
+        self.frames.append(self.cur.pop("frame"))
+        self.last, self.cur = self.cur, {}
+        self.t_frame = None
+
+    def percentiles(self, ps=(50, 95, 99)):
+        if not self.frames: return [0.0]*len(ps) + [0.0]
+        s = sorted(self.frames)
+        return [s[min(len(s)-1, len(s)*p // 100)] for p in ps] + [s[-1]]
+
+    def histogram(self):
+        counts = [0]*(len(HIST_MS)+1)
+        for ms in self.frames:
+            i = 0
+            while i < len(HIST_MS) and ms >= HIST_MS[i]: i += 1
+            counts[i] += 1
+        return counts
+
+    def draw_hud(self, surf, text, extra=""):
+        """Draw the HUD into hud_rect. text(s, size, color) -> Surface."""
+        r = self.hud_rect
+        bg = pygame.Surface(r.size, pygame.SRCALPHA); bg.fill((0, 0, 0, 190))
+        surf.blit(bg, r)
+        p50, p95, p99, worst = self.percentiles()
+        lines = [f"frame ms  p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f}  max {worst:.1f}", extra]
+        top = sorted(self.last.items(), key=lambda kv: -kv[1])[:4]
+        lines += [f"{name:14} {ms:6.2f} ms" for name, ms in top]
+        y = r.y + 4
+        for ln in lines:
+            if ln: surf.blit(text(ln, 12, (200, 255, 200)), (r.x + 6, y))
+            y += 15
+        counts = self.histogram()
+        bw = (r.w - 12) // len(counts)
+        peak = max(max(counts), 1)
+        base = r.bottom - 6
+        for i, n in enumerate(counts):
+            h = int(28 * n / peak)
+            col = (90, 220, 120) if i < 4 else (240, 200, 60) if i < 6 else (255, 80, 80)
+            pygame.draw.rect(surf, col, (r.x + 6 + i*bw, base - h, bw - 2, h))
+        return r
+
+    def dump(self, path=None):
+        """Write the ring buffer as Chrome trace JSON. Returns the path."""
+        path = path or time.strftime("trace-%Y%m%d-%H%M%S.json")
+        events = [{"name": name, "ph": "X", "ts": t0/1e3, "dur": dur/1e3, "pid": self.pid, "tid": 0}
+                  for name, t0, dur in self.spans]
+        with open(path, "w") as f: json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+PROF = Profiler()
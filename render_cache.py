@@ -0,0 +1,110 @@
+"""Font, text and tile surface caches for the pygame renderer.
+
+Values like "2", "16" or "SCORE" never change between frames, so fonts,
+rendered strings and fully composed tiles are built once and reused.
+Every layer is a small LRU so changing strings (the score) can't grow it
+without bound. Nothing touches pygame until the first lookup.
+
+Finding a font by name makes pygame enumerate every installed font
+(fc-list on Linux), which takes hundreds of ms on machines with many
+fonts. FontPaths keeps the file it picked in a small JSON file, so later
+runs open it directly.
+"""
+import json
+import os
+from collections import OrderedDict
+
+import pygame
+
+
+class LRU:
+    """Bounded mapping that drops the least recently used entry."""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key, make):
+        d = self.data
+        if key in d:
+            self.hits += 1
+            d.move_to_end(key)
+            return d[key]
+        self.misses += 1
+        val = d[key] = make()
+        if len(d) > self.maxsize: d.popitem(last=False)
+        return val
+
+    def clear(self): self.data.clear()
+
+    def __len__(self): return len(self.data)
+
+
+def resolve_font(name, bold):
+    """(font file or None for pygame's default, fake bold) SysFont would use."""
+    return pygame.font.SysFont(name, 0, bold, constructor=lambda path, size, bold, italic: (path, bold))
+
+
+class FontPaths:
+    """resolve_font results, kept in a JSON file between runs if path is set.
+
+    A cached file that has gone is resolved again; delete the cache after
+    installing a font that was missing when it was written.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.found = None
+
+    def _read(self):
+        try:
+            with open(self.path) as f: found = json.load(f)
+            return found if isinstance(found, dict) else {}
+        except (OSError, ValueError, TypeError): return {}
+
+    def _write(self):
+        try:
+            with open(self.path + ".tmp", "w") as f: json.dump(self.found, f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError: pass   # Read-only install: resolve again next run
+
+    def get(self, name, bold):
+        if self.found is None: self.found = self._read() if self.path else {}
+        key = f"{name}:{int(bold)}"
+        hit = self.found.get(key)
+        if not (isinstance(hit, list) and len(hit) == 2 and (hit[0] is None or os.path.exists(hit[0]))):
+            hit = self.found[key] = list(resolve_font(name, bold))
+            if self.path: self._write()
+        return hit
+
+
+class RenderCache:
+    """Fonts by (name, size, bold), text by (text, size, color), tiles by key."""
+    def __init__(self, font_name, fonts=32, texts=512, tiles=128, font_cache=None):
+        self.font_name = font_name
+        self.paths = FontPaths(font_cache)
+        self.fonts = LRU(fonts)
+        self.texts = LRU(texts)
+        self.tiles = LRU(tiles)
+
+    def _open(self, name, size, bold):
+        path, fake_bold = self.paths.get(name, bold)
+        font = pygame.font.Font(path, size)
+        if fake_bold: font.set_bold(True)
+        return font
+
+    def font(self, size, bold=True, name=None):
+        name = name or self.font_name
+        return self.fonts.get((name, size, bold), lambda: self._open(name, size, bold))
+
+    def text(self, text, size, color):
+        """Shared surface: copy it before changing alpha or drawing on it."""
+        text = str(text)
+        return self.texts.get((text, size, tuple(color)),
+                              lambda: self.font(size).render(text, True, color))
+
+    def tile(self, key, build):
+        """Surface for key, composed by build() on a miss."""
+        return self.tiles.get(key, build)
+
+    def clear(self):
+        self.fonts.clear(); self.texts.clear(); self.tiles.clear()
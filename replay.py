@@ -0,0 +1,82 @@
+"""Headless replay and verification of recorded games.
+
+    python replay.py                      # verify every game in replays.dat
+    python replay.py other.dat -j 1       # ... in this process only
+    python replay.py --show 3             # print game 3's final board
+
+Each game is re-simulated from its seed and action log with no timers or
+rendering, then its score and final board are compared with what was
+recorded. Exit status is 1 if any game doesn't match.
+"""
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from actions import DROP, SWAP, HAMMER, UNDO, REDO, decode, board_crc, read_replays
+from bitboard import BitEngine
+from engine import Engine, SPAWN_VALUES
+
+ENGINES = {"list": Engine, "bit": BitEngine}
+
+
+def apply(g, op, arg):
+    """Play one logged move on g."""
+    if op == DROP:
+        if g.drop(arg) >= 0: g.step()
+    elif op == SWAP: g.swap()
+    elif op == HAMMER: g.hammer(arg // g.cols, arg % g.cols)
+    elif op == UNDO: g.undo()
+    elif op == REDO: g.redo()
+
+
+def replay(rep, engine=BitEngine):
+    """Re-simulate rep; returns the engine at the end of the game."""
+    g = engine(rep.rows, rep.cols, seed=rep.seed, spawn=rep.spawn or SPAWN_VALUES)
+    for op, arg in decode(rep.actions): apply(g, op, arg)
+    return g
+
+
+def verify(rep, engine=BitEngine):
+    """(ok, replayed score, moves replayed)."""
+    try: g = replay(rep, engine)
+    except OverflowError: g = replay(rep, Engine)   # Tiles past 4 bits on a big board
+    return g.score == rep.score and board_crc(g.board) == rep.board_crc, g.score, len(g.log)
+
+
+def _verify(args): return verify(*args)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay recorded Drop Merge 2048 games")
+    ap.add_argument("path", nargs="?", default="replays.dat")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: one per CPU)")
+    ap.add_argument("--engine", choices=ENGINES, default="bit")
+    ap.add_argument("--show", type=int, metavar="N", help="print game N's final board instead")
+    args = ap.parse_args(argv)
+    reps = read_replays(args.path)
+    engine = ENGINES[args.engine]
+
+    if args.show is not None:
+        g = replay(reps[args.show], engine)
+        for row in g.board: print(" ".join(f"{v:5}" if v else "    ." for v in row))
+        print(f"score {g.score} (recorded {reps[args.show].score}) gems {g.gems}")
+        return 0
+
+    t0 = time.perf_counter()
+    jobs = [(r, engine) for r in reps]
+    if args.jobs > 1:
+        with Pool(args.jobs) as pool: results = pool.map(_verify, jobs, chunksize=64)
+    else:
+        results = [verify(*j) for j in jobs]
+    dt = time.perf_counter() - t0
+    bad = [i for i, (ok, _, _) in enumerate(results) if not ok]
+    for i in bad[:20]: print(f"game {i}: recorded {reps[i].score}, replayed {results[i][1]}")
+    moves = sum(m for _, _, m in results)
+    print(f"{len(reps)} games, {moves} moves in {dt:.2f}s ({moves/max(dt, 1e-9):.0f} moves/s), {len(bad)} mismatched")
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
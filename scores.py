@@ -0,0 +1,229 @@
+"""Persistent score history.
+
+Every finished game is one fixed-size record appended to record.dat,
+after logfile.py's header:
+
+    record   q score, q unix time, I crc32 of the first 16 bytes
+
+Appends are flushed and fsynced, so a power cut can at worst leave a
+partial record at the end of the file; opening the log truncates it away,
+and a record whose CRC doesn't match is skipped. Loading rebuilds a
+bounded min-heap of the best K games, so get_best() is a lookup and a new
+game costs O(log K) instead of a sort and a full rewrite. compact()
+rewrites the log through a temp file and os.replace, which is atomic on
+the same filesystem.
+
+SqliteHistory is a drop-in alternative backed by one indexed table, for
+querying the full history by score or date.
+"""
+import heapq
+import json
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+
+from logfile import HEADER, open_append, read_file, set_aside, whole, write_file
+
+MAGIC = b"DM2048SC"
+VERSION = 1
+BODY = struct.Struct("<qq")
+RECORD = struct.Struct("<qqI")
+TOP_K = 50
+DATE_FMT = "%Y-%m-%d %H:%M"
+
+
+def fmt_date(ts): return datetime.fromtimestamp(ts).strftime(DATE_FMT)
+
+
+def pack_record(score, ts):
+    body = BODY.pack(score, ts)
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def read_log(path):
+    """(records, good_size): valid (score, ts) pairs and the byte length up
+    to the last whole record. Raises ValueError if path isn't a score log."""
+    _, data = read_file(path, MAGIC, (VERSION,), "score log")
+    end = whole(len(data), HEADER.size, RECORD.size)
+    out = []
+    for o in range(HEADER.size, end, RECORD.size):
+        score, ts, crc = RECORD.unpack_from(data, o)
+        if zlib.crc32(data[o:o+BODY.size]) == crc: out.append((score, ts))
+    return out, end
+
+
+def write_log(path, records):
+    """Atomically replace path with a log holding records."""
+    write_file(path, MAGIC, VERSION, b"".join(pack_record(s, t) for s, t in records))
+
+
+def is_legacy(path):
+    """True if path is empty or holds the plain-text best score the game
+    used to keep in record.dat, rather than a log."""
+    with open(path, "rb") as f: old = f.read(HEADER.size).strip()
+    return not old or (len(old) < HEADER.size and old.isdigit())
+
+
+def legacy_records(json_path="history.json", old_log=None):
+    """(score, ts) pairs from the old history.json and, if given, the plain
+    text best score the game used to keep in record.dat."""
+    out = []
+    try:
+        with open(json_path) as f: entries = json.load(f)
+        for e in entries:
+            try: ts = int(datetime.strptime(e["date"], DATE_FMT).timestamp())
+            except (KeyError, ValueError): ts = 0
+            out.append((int(e["score"]), ts))
+    except (OSError, ValueError, TypeError, KeyError): pass
+    if old_log is not None:
+        try:
+            with open(old_log) as f: best = int(f.read().strip())
+            if best > 0 and all(s < best for s, _ in out):
+                out.append((best, int(os.path.getmtime(old_log))))
+        except (OSError, ValueError): pass
+    return out
+
+
+class TopK:
+    """The k highest (score, ts) pairs; ties keep the earlier game."""
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.heap = []   # min-heap of (score, -seq, ts)
+        self.seq = 0
+        self.best = 0
+        self._sorted = None
+
+    def push(self, score, ts):
+        self.seq += 1
+        item = (score, -self.seq, ts)
+        if len(self.heap) < self.k: heapq.heappush(self.heap, item)
+        elif item > self.heap[0]: heapq.heapreplace(self.heap, item)
+        else: return
+        if score > self.best: self.best = score
+        self._sorted = None
+
+    def entries(self):
+        """Best first, as {"score", "date"} dicts."""
+        if self._sorted is None:
+            self._sorted = [{"score": s, "date": fmt_date(t)} for s, _, t in sorted(self.heap, reverse=True)]
+        return self._sorted
+
+
+class HistoryManager:
+    """Score history in an append-only record log.
+
+    A record.dat that isn't a log yet (missing, or the old plain-text best
+    score) is created from history.json and the old contents on first open.
+    Any other file that isn't a score log is renamed aside (set_aside is
+    its new name) and a new, empty log started; nothing is written over.
+    """
+    def __init__(self, filename="record.dat", legacy="history.json", top_k=TOP_K):
+        self.filename = filename
+        self.legacy = legacy
+        self.top = TopK(top_k)
+        self.count = 0
+        self.skipped = 0   # records dropped for a bad CRC
+        self.set_aside = None
+        self.load()
+
+    def load(self):
+        path = self.filename
+        if not os.path.exists(path) or is_legacy(path):
+            old = path if os.path.exists(path) else None
+            write_log(path, [r for r in legacy_records(self.legacy, old) if r[0] > 0])
+        try: records, size = read_log(path)
+        except ValueError:
+            self.set_aside = set_aside(path)
+            write_log(path, [])
+            records, size = [], HEADER.size
+        if os.path.getsize(path) > size:
+            with open(path, "r+b") as f: f.truncate(size)   # Torn final record
+        self.skipped = (size - HEADER.size)//RECORD.size - len(records)
+        self.top = TopK(self.top.k)
+        for score, ts in records: self.top.push(score, ts)
+        self.count = len(records)
+
+    @property
+    def scores(self): return self.top.entries()
+
+    def add_entry(self, score, ts=None):
+        if score == 0: return
+        ts = int(time.time()) if ts is None else ts
+        with open_append(self.filename, MAGIC, VERSION, "score log", RECORD.size) as f:
+            f.write(pack_record(score, ts))
+            f.flush(); os.fsync(f.fileno())
+        self.top.push(score, ts)
+        self.count += 1
+
+    def get_best(self): return self.top.best
+
+    def records(self):
+        """Every valid (score, ts) in the order played."""
+        return read_log(self.filename)[0]
+
+    def compact(self, keep=None):
+        """Rewrite the log without bad records; keep limits it to the top-K
+        games plus the `keep` most recent ones."""
+        records = self.records()
+        if keep is not None:
+            top = set(sorted(range(len(records)), key=lambda i: (-records[i][0], i))[:self.top.k])
+            recent = set(range(max(0, len(records)-keep), len(records)))
+            records = [r for i, r in enumerate(records) if i in top or i in recent]
+        write_log(self.filename, records)
+        self.load()
+
+
+class SqliteHistory:
+    """HistoryManager on a SQLite table indexed by score and by date."""
+    def __init__(self, filename="scores.db", legacy="history.json", top_k=TOP_K):
+        self.filename = filename
+        import sqlite3   # Only this backend needs it; keeps it off the game's startup
+        self.top_k = top_k
+        self.db = sqlite3.connect(filename)
+        with self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS scores (id INTEGER PRIMARY KEY, score INTEGER NOT NULL, ts INTEGER NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS scores_score ON scores (score DESC, id)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS scores_ts ON scores (ts)")
+            if self.db.execute("SELECT COUNT(*) FROM scores").fetchone()[0] == 0:
+                self.db.executemany("INSERT INTO scores (score, ts) VALUES (?, ?)",
+                                    [r for r in legacy_records(legacy) if r[0] > 0])
+        self.load()
+
+    def load(self):
+        rows = self.db.execute("SELECT score, ts FROM scores ORDER BY score DESC, id LIMIT ?", (self.top_k,)).fetchall()
+        self._scores = [{"score": s, "date": fmt_date(t)} for s, t in rows]
+        self.best = rows[0][0] if rows else 0
+        self.count = self.db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    @property
+    def scores(self): return self._scores
+
+    def add_entry(self, score, ts=None):
+        if score == 0: return
+        ts = int(time.time()) if ts is None else ts
+        with self.db: self.db.execute("INSERT INTO scores (score, ts) VALUES (?, ?)", (score, ts))
+        self.count += 1
+        if len(self._scores) < self.top_k or score > self._scores[-1]["score"]: self.load()
+
+    def get_best(self): return self.best
+
+    def records(self, since=None, until=None):
+        """(score, ts) in the order played, optionally within [since, until)."""
+        q, args = "SELECT score, ts FROM scores WHERE ts >= ? AND ts < ? ORDER BY id", (since or 0, until or 2**62)
+        return self.db.execute(q, args).fetchall()
+
+    def compact(self, keep=None):
+        with self.db:
+            if keep is not None:
+                self.db.execute("""DELETE FROM scores WHERE id NOT IN (SELECT id FROM scores ORDER BY score DESC, id LIMIT ?)
+                                   AND id NOT IN (SELECT id FROM scores ORDER BY id DESC LIMIT ?)""", (self.top_k, keep))
+        self.db.execute("VACUUM")
+        self.load()
+
+
+def open_history(backend=None):
+    """HistoryManager, or SqliteHistory for backend "sqlite"."""
+    return SqliteHistory() if backend == "sqlite" else HistoryManager()
@@ -0,0 +1,388 @@
+"""Asyncio server hosting many headless games over JSON lines.
+
+    python server.py                          # TCP on 127.0.0.1:7048
+    python server.py --unix /tmp/dm2048.sock  # Unix socket instead
+    python server.py --bench 50000            # in-process server + client load test
+
+Every request is one JSON object per line and gets one line back, in
+order, so clients can pipeline:
+
+    {"cmd": "new", "seed": 7}                  -> {"ok": true, "session": "9f..", "board": [[..]], ...}
+    {"cmd": "drop", "session": "9f..", "col": 2}
+    {"cmd": "swap" | "undo" | "redo" | "state" | "close", "session": ..}
+    {"cmd": "hammer", "session": .., "r": 6, "c": 0}
+    {"cmd": "metrics"}  or  {"cmd": "metrics", "session": ..}
+
+Moves answer with "moved", the cells that changed as [r, c, value] in
+"changes", and score, gems, curr, next and over; only "new" and "state"
+send the whole board. An "id" in a request is echoed back.
+
+Sessions are seeded BitEngines. One idle for longer than --idle seconds
+is written to --store as a one-game replay file (seed + action log, see
+actions.py) and dropped from memory; the next request for it replays the
+log, which restores the undo history too, and checks the board CRC. The
+writes and their fsyncs run in the loop's default executor, so a sweep
+that evicts thousands of sessions doesn't hold up clients. A session
+stays in memory until its file is written, and one that gets a request
+or is closed in the meantime keeps its place and loses the file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from functools import partial
+
+from actions import Replay, append_replay, board_crc, read_replays
+from bitboard import BitEngine, MAX_EXP, unpack
+from engine import Engine, ROWS, COLS, SPAWN_VALUES
+from replay import replay
+
+HOST, PORT = "127.0.0.1", 7048
+IDLE_S = 300          # seconds without a request before a session goes to disk
+UNDO_DEPTH = 64       # per session; a server holds thousands
+LATENCY_WINDOW = 1 << 16
+READ_SIZE = 1 << 16
+EVICT_BATCH = 64      # files written at once by a sweep; clients are served between batches
+MAX_SIDE = 255        # replay files keep rows, cols and the spawn count in a byte each
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+_decode = json.JSONDecoder().decode
+
+
+def state(g):
+    return {"score": g.score, "gems": g.gems, "curr": g.curr, "next": g.next, "over": g.over}
+
+
+def changes(g, before):
+    """[r, c, value] for every cell that differs from before (bits or a board)."""
+    if isinstance(before, int):
+        out, x, rows = [], before ^ g.bits, g.rows
+        while x:
+            i = ((x & -x).bit_length()-1) >> 2
+            e = (g.bits >> 4*i) & 15
+            out.append([rows-1 - i % rows, i // rows, 1 << e if e else 0])
+            x &= ~(15 << 4*i)
+        return out
+    return [[r, c, v] for r, (row, old) in enumerate(zip(g.board, before)) if row != old
+            for c, v in enumerate(row) if v != old[c]]
+
+
+def apply_changes(board, diff):
+    """Client side: bring a board up to date with a response's changes."""
+    for r, c, v in diff: board[r][c] = v
+    return board
+
+
+class Session:
+    def __init__(self, sid, g):
+        self.sid, self.g = sid, g
+        self.last = time.monotonic()
+        self.requests = self.total_ns = self.max_ns = 0
+
+    def metrics(self):
+        n = max(self.requests, 1)
+        return {"session": self.sid, "requests": self.requests, "moves": len(self.g.log),
+                "mean_us": self.total_ns/n/1e3, "max_us": self.max_ns/1e3}
+
+
+def _on_board(g, r, c):
+    """Refuse client coordinates off g's board before the engine sees them."""
+    if not (0 <= r < g.rows and 0 <= c < g.cols): raise ValueError(f"cell ({r}, {c}) is off the board")
+    return r, c
+
+
+def store(path, rep):
+    """Write rep as the one game in path (replacing any older file)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path): os.remove(path)
+    append_replay(path, rep)
+
+
+def _drop(g, msg):
+    _, col = _on_board(g, 0, int(msg["col"]))
+    if g.drop(col) < 0: return False
+    g.step()
+    return True
+
+
+MOVES = {
+    "drop": _drop,
+    "swap": lambda g, msg: g.swap(),
+    "hammer": lambda g, msg: g.hammer(*_on_board(g, int(msg["r"]), int(msg["c"]))),
+    "undo": lambda g, msg: g.undo(),
+    "redo": lambda g, msg: g.redo(),
+}
+
+
+class Server:
+    """Sessions by id plus the socket handlers. Everything runs on one loop."""
+    def __init__(self, store="sessions", idle_s=IDLE_S, undo_depth=UNDO_DEPTH):
+        self.store = store
+        self.idle_s = idle_s
+        self.undo_depth = undo_depth
+        self.sessions = {}
+        self.evicting = set()   # sids being written by sweep_async
+        self.latency = deque(maxlen=LATENCY_WINDOW)   # ns per request
+        self.requests = self.moves = self.evicted = self.loaded = 0
+        self.started = time.monotonic()
+
+    # --- sessions ---
+
+    def path(self, sid): return os.path.join(self.store, sid + ".rp")
+
+    def engine(self, cls=BitEngine): return partial(cls, undo_depth=self.undo_depth)
+
+    def new(self, seed=None, rows=ROWS, cols=COLS, spawn=SPAWN_VALUES):
+        """A session for a new game. Raises ValueError for settings a BitEngine
+        or the session's replay file can't hold."""
+        if not (1 <= rows <= MAX_SIDE and 1 <= cols <= MAX_SIDE): raise ValueError(f"rows and cols must be 1 to {MAX_SIDE}")
+        if not 0 < len(spawn) <= MAX_SIDE or any(type(v) is not int or v < 2 or v & (v-1) or v > 1 << MAX_EXP for v in spawn):
+            raise ValueError(f"spawn must be 1 to {MAX_SIDE} powers of two from 2 to {1 << MAX_EXP}")
+        if seed is None: seed = int.from_bytes(os.urandom(8), "little")
+        elif type(seed) is not int or not 0 <= seed < 1 << 64: raise ValueError("seed must be an integer from 0 to 2**64-1")
+        sid = os.urandom(8).hex()
+        s = self.sessions[sid] = Session(sid, self.engine()(rows, cols, seed=seed, spawn=spawn))
+        return s
+
+    def session(self, sid):
+        s = self.sessions.get(sid)
+        if s is None:
+            s = self.load(sid)
+        s.last = time.monotonic()
+        return s
+
+    def record(self, s):
+        g = s.g
+        spawn = () if g.spawn == SPAWN_VALUES else g.spawn
+        return Replay(g.score, int(time.time()), g.seed, g.rows, g.cols, board_crc(g.board), bytes(g.log), spawn)
+
+    def evict(self, s):
+        """Write s to the store and forget it."""
+        store(self.path(s.sid), self.record(s))
+        del self.sessions[s.sid]
+        self.evicted += 1
+
+    def load(self, sid):
+        if not sid.isalnum() or sid in self.evicting or not os.path.exists(self.path(sid)): raise LookupError(f"no session {sid}")
+        rep = read_replays(self.path(sid))[0]
+        try: g = replay(rep, self.engine())
+        except OverflowError: g = replay(rep, self.engine(Engine))
+        if board_crc(g.board) != rep.board_crc or g.score != rep.score: raise ValueError(f"session {sid} does not replay")
+        os.remove(self.path(sid))
+        s = self.sessions[sid] = Session(sid, g)
+        self.loaded += 1
+        return s
+
+    def idle(self):
+        cutoff = time.monotonic() - self.idle_s
+        return [s for s in self.sessions.values() if s.last < cutoff and s.sid not in self.evicting]
+
+    def sweep(self):
+        """Evict every session idle for longer than idle_s. Returns how many."""
+        idle = self.idle()
+        for s in idle: self.evict(s)
+        return len(idle)
+
+    async def sweep_async(self):
+        """sweep() with the file writes in the default executor. Returns how
+        many sessions were evicted."""
+        loop, idle, n = asyncio.get_running_loop(), self.idle(), 0
+        for i in range(0, len(idle), EVICT_BATCH):
+            cutoff = time.monotonic() - self.idle_s
+            batch = [s for s in idle[i:i+EVICT_BATCH] if self.sessions.get(s.sid) is s and s.last < cutoff]
+            self.evicting.update(s.sid for s in batch)
+            try:
+                jobs = [(s, s.last, loop.run_in_executor(None, store, self.path(s.sid), self.record(s))) for s in batch]
+                for s, last, job in jobs:
+                    try: await job
+                    except Exception as e: print(f"could not evict {s.sid}: {e!r}", file=sys.stderr); continue
+                    if self.sessions.get(s.sid) is s and s.last == last:
+                        del self.sessions[s.sid]
+                        self.evicted += 1; n += 1
+                    else:   # Used or closed while it was written
+                        try: os.remove(self.path(s.sid))
+                        except FileNotFoundError: pass
+            finally: self.evicting.difference_update(s.sid for s in batch)
+        return n
+
+    # --- requests ---
+
+    def move(self, s, cmd, msg):
+        g = s.g
+        before = g.bits if isinstance(g, BitEngine) else [row[:] for row in g.board]
+        try: moved = bool(MOVES[cmd](g, msg))
+        except OverflowError:
+            # Past the 4-bit tiles: carry on with the list engine from the log
+            before = unpack(before, g.rows, g.cols)
+            g = s.g = replay(Replay(0, 0, g.seed, g.rows, g.cols, 0, bytes(g.log), g.spawn), self.engine(Engine))
+            moved = True
+        self.moves += moved
+        return {"moved": moved, "changes": changes(g, before) if moved else [], **state(g)}
+
+    def dispatch(self, msg):
+        cmd = msg.get("cmd")
+        if cmd in MOVES: return self.move(self.session(msg["session"]), cmd, msg)
+        if cmd == "state":
+            g = self.session(msg["session"]).g
+            return {"board": g.board, "moves": len(g.log), **state(g)}
+        if cmd == "new":
+            spawn = tuple(msg.get("spawn") or SPAWN_VALUES)
+            s = self.new(msg.get("seed"), int(msg.get("rows", ROWS)), int(msg.get("cols", COLS)), spawn)
+            return {"session": s.sid, "seed": s.g.seed, "board": s.g.board, **state(s.g)}
+        if cmd == "close":
+            sid = msg["session"]
+            if self.sessions.pop(sid, None) is None:
+                if not sid.isalnum() or not os.path.exists(self.path(sid)): raise LookupError(f"no session {sid}")
+                os.remove(self.path(sid))
+            return {}
+        if cmd == "metrics":
+            return self.session(msg["session"]).metrics() if "session" in msg else self.metrics()
+        raise ValueError(f"unknown cmd {cmd!r}")
+
+    def handle(self, line):
+        """One request line -> one response line."""
+        t0 = time.perf_counter_ns()
+        msg, sid = {}, None
+        try:
+            msg = _decode(line.decode())
+            sid = msg.get("session")
+            out = {"ok": True, **self.dispatch(msg)}
+        except KeyError as e: out = {"ok": False, "error": f"missing {e.args[0]}"}
+        except (LookupError, ValueError, TypeError, AttributeError) as e: out = {"ok": False, "error": str(e)}
+        if isinstance(msg, dict) and "id" in msg: out["id"] = msg["id"]
+        dt = time.perf_counter_ns() - t0
+        self.requests += 1
+        self.latency.append(dt)
+        s = self.sessions.get(sid) if isinstance(sid, str) else None
+        if s is not None:
+            s.requests += 1; s.total_ns += dt
+            if dt > s.max_ns: s.max_ns = dt
+        return _encode(out).encode() + b"\n"
+
+    def metrics(self):
+        lat = sorted(self.latency)
+        pct = lambda p: lat[min(len(lat)-1, len(lat)*p // 100)]/1e3 if lat else 0.0
+        up = time.monotonic() - self.started
+        return {"sessions": len(self.sessions), "evicted": self.evicted, "loaded": self.loaded,
+                "requests": self.requests, "moves": self.moves, "moves_per_s": self.moves/max(up, 1e-9),
+                "p50_us": pct(50), "p99_us": pct(99), "max_us": lat[-1]/1e3 if lat else 0.0}
+
+    # --- sockets ---
+
+    async def client(self, reader, writer):
+        buf = b""
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data: break
+                *lines, buf = (buf + data).split(b"\n")
+                # Answer everything that arrived in one write
+                writer.write(b"".join(self.handle(ln) for ln in lines if ln.strip()))
+                await writer.drain()
+        except ConnectionError: pass
+        finally: writer.close()
+
+    async def sweeper(self):
+        while True:
+            await asyncio.sleep(max(self.idle_s/4, 0.05))
+            await self.sweep_async()
+
+    async def serve(self, unix=None, host=HOST, port=PORT):
+        """Listen (and evict idle sessions) until cancelled."""
+        srv = await (asyncio.start_unix_server(self.client, unix) if unix else asyncio.start_server(self.client, host, port))
+        sweep = asyncio.create_task(self.sweeper())
+        try:
+            async with srv: await srv.serve_forever()
+        finally: sweep.cancel()
+
+
+class Client:
+    """Stand-in thin client: requests go out as lines, replies come back in order."""
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.buf = b""
+
+    @classmethod
+    async def connect(cls, unix=None, host=HOST, port=PORT):
+        return cls(*await (asyncio.open_unix_connection(unix) if unix else asyncio.open_connection(host, port)))
+
+    async def batch(self, msgs):
+        """Send msgs pipelined; their replies in order."""
+        self.writer.write(b"".join(json.dumps(m).encode() + b"\n" for m in msgs))
+        await self.writer.drain()
+        lines = []
+        while len(lines) < len(msgs):
+            data = await self.reader.read(READ_SIZE)
+            if not data: raise ConnectionError("server closed the connection")
+            *got, self.buf = (self.buf + data).split(b"\n")
+            lines += got
+        return [json.loads(ln) for ln in lines]
+
+    async def request(self, **msg): return (await self.batch([msg]))[0]
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def bench(moves, sessions, pipeline=256, idle_s=IDLE_S):
+    """Serve on a scratch Unix socket (TCP on Windows), play random drops
+    from a client and check its diff-mirrored boards against the server."""
+    tmp = tempfile.mkdtemp(prefix="dm2048-server-")
+    unix = os.path.join(tmp, "s.sock") if hasattr(asyncio, "start_unix_server") else None
+    server = Server(os.path.join(tmp, "store"), idle_s)
+    task = asyncio.create_task(server.serve(unix, HOST, 0 if unix else PORT))
+    await asyncio.sleep(0.1)
+    c = await Client.connect(unix)
+    rng = random.Random(0)
+    games = {}   # sid -> mirrored board
+    for r in await c.batch([{"cmd": "new", "seed": i} for i in range(sessions)]): games[r["session"]] = r["board"]
+    sids, done, t0 = list(games), 0, time.perf_counter()
+    while done < moves:
+        batch = [rng.choice(sids) for _ in range(min(pipeline, moves - done))]
+        over = set()
+        for sid, r in zip(batch, await c.batch([{"cmd": "drop", "session": sid, "col": rng.randrange(COLS)} for sid in batch])):
+            if r["ok"]: apply_changes(games[sid], r["changes"])
+            if r.get("over"): over.add(sid)
+        # Start those slots over
+        reps = await c.batch([m for sid in over for m in ({"cmd": "close", "session": sid}, {"cmd": "new"})])
+        for sid, new in zip(over, reps[1::2]):
+            sids[sids.index(sid)] = new["session"]; games[new["session"]] = new["board"]
+        done += len(batch)
+    dt = time.perf_counter() - t0
+    bad = sum(r["board"] != games[sid] for sid, r in zip(sids, await c.batch([{"cmd": "state", "session": s} for s in sids])))
+    m = await c.request(cmd="metrics")
+    await c.close()
+    task.cancel()
+    print(f"{moves} requests over {sessions} sessions in {dt:.2f}s ({moves/dt:.0f}/s), {bad} mirrored boards differ")
+    print(f"server: p50 {m['p50_us']:.1f} us, p99 {m['p99_us']:.1f} us, max {m['max_us']:.0f} us; "
+          f"{m['evicted']} evicted, {m['loaded']} reloaded")
+    return 1 if bad else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Host Drop Merge 2048 sessions over JSON lines")
+    ap.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--store", default="sessions", help="directory for evicted sessions")
+    ap.add_argument("--idle", type=float, default=IDLE_S, help="seconds before an idle session is evicted")
+    ap.add_argument("--undo-depth", type=int, default=UNDO_DEPTH)
+    ap.add_argument("--bench", type=int, metavar="N", help="run N drops through an in-process server and exit")
+    ap.add_argument("--sessions", type=int, default=1000, help="sessions for --bench")
+    args = ap.parse_args(argv)
+    if args.bench: return asyncio.run(bench(args.bench, args.sessions, idle_s=args.idle))
+    server = Server(args.store, args.idle, args.undo_depth)
+    print(f"serving on {args.unix or f'{args.host}:{args.port}'}")
+    try: asyncio.run(server.serve(args.unix, args.host, args.port))
+    except KeyboardInterrupt: pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+"""BatchEngine against the scalar Engine on fixed seeds."""
+import numpy as np
+
+from batch import BatchEngine
+from engine import Engine
+
+
+def test_batch_games_replay_on_engine():
+    n = 300
+    seeds = np.arange(n)*7919 + 5
+    b, rng, hist = BatchEngine(n, seeds=seeds), np.random.default_rng(0), []
+    while not b.over.all():
+        cols = b.random_columns(rng)
+        if not b.drop(cols).any(): break
+        hist.append(cols)
+    for i in range(n):
+        g = Engine(seed=int(seeds[i]))
+        for cols in hist:
+            if cols[i] >= 0 and not g.over and g.drop(int(cols[i])) >= 0: g.step()
+        assert g.board == b.values(i), i
+        assert (g.score, g.gems, g.curr, g.over, len(g.log)) == (b.score[i], b.gems[i], 1 << int(b.curr[i]), b.over[i], b.moves[i]), i
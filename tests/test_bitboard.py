@@ -0,0 +1,23 @@
+"""bitboard.merge_pass against groups.merge_scan."""
+import random
+
+import pytest
+
+from bitboard import layout, merge_pass, pack, unpack
+from groups import merge_scan
+
+
+@pytest.mark.parametrize("values", [(2,), (2, 4), (2, 4, 8, 16)])
+def test_merge_pass_matches_merge_scan(values):
+    """Dense boards of few values make doubled anchors clash with later groups."""
+    rng = random.Random(len(values))
+    for t in range(5000):
+        rows, cols = rng.choice([(7, 5), (4, 4), (9, 6), (3, 8)])
+        b = [[rng.choice(values) if rng.random() < 0.8 else 0 for _ in range(cols)] for _ in range(rows)]
+        L = layout(rows, cols)
+        bits, merges = merge_pass(pack(b, rows, cols), L)
+        fast_bits, fast = merge_pass(pack(b, rows, cols), L, cells=False)
+        ref = merge_scan(b, rows, cols)
+        assert unpack(bits, rows, cols) == b and fast_bits == bits, t
+        assert [(m.anchor, m.val, sorted(m.cells)) for m in ref] == [(m.anchor, m.val, sorted(m.cells)) for m in merges], t
+        assert [m.new_val for m in fast] == [m.new_val for m in ref], t
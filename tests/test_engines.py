@@ -0,0 +1,62 @@
+"""Engine backends playing the same seeded games move for move."""
+import random
+
+import pytest
+
+from bitboard import BitEngine
+from engine import Engine
+
+
+def state(g):
+    return [row[:] for row in g.board], g.score, g.gems, g.curr, g.next, g.over, bytes(g.log)
+
+
+def play(make, seed, moves=400):
+    """States after each move of a seeded game with random actions."""
+    g, rng, out = make(seed), random.Random(seed), []
+    for _ in range(moves):
+        if g.over: break
+        a = rng.random()
+        if a < 0.05: g.swap()
+        elif a < 0.09: g.undo()
+        elif a < 0.11: g.redo()
+        elif a < 0.14: g.hammer(rng.randrange(g.rows), rng.randrange(g.cols))
+        elif g.drop(rng.randrange(g.cols)) >= 0: g.step()
+        out.append(state(g))
+    return out
+
+
+@pytest.mark.parametrize("make", [
+    lambda seed: Engine(seed=seed, incremental=False),
+    lambda seed: BitEngine(seed=seed),
+    lambda seed: BitEngine(9, 6, seed=seed, spawn=(2, 4, 8)),
+], ids=["engine_full", "bitboard", "bitboard_9x6"])
+def test_matches_incremental_engine(make):
+    for seed in range(60):
+        g = make(seed)
+        ref = play(lambda s: Engine(g.rows, g.cols, seed=s, spawn=g.spawn), seed)
+        assert play(make, seed) == ref, seed
+
+
+@pytest.mark.parametrize("cls", [Engine, BitEngine])
+@pytest.mark.parametrize("move", [lambda g: g.drop(-1), lambda g: g.drop(5), lambda g: g.landing_row(9),
+                                  lambda g: g.hammer(7, 0), lambda g: g.hammer(0, -1)])
+def test_off_board_moves_raise_before_changing_anything(cls, move):
+    g = cls(seed=3)
+    g.drop(2); g.step()
+    before = state(g)
+    with pytest.raises(IndexError): move(g)
+    assert state(g) == before
+
+
+def test_bitboard_drop_past_4_bits_raises_before_changing_anything():
+    g = BitEngine(seed=3, spawn=(1 << 16,))
+    before = state(g)
+    with pytest.raises(OverflowError): g.drop(0)
+    assert state(g) == before
+
+
+@pytest.mark.parametrize("cls", [Engine, BitEngine])
+@pytest.mark.parametrize("spawn", [(), (3,), (2, 6), (1,), (0,)])
+def test_spawn_tiles_must_be_powers_of_two(cls, spawn):
+    with pytest.raises(ValueError): cls(seed=0, spawn=spawn)
@@ -0,0 +1,78 @@
+"""MergeDetector against merge_scan, the ordered scan that defines the rules."""
+import random
+
+import pytest
+
+from groups import MergeDetector, merge_scan
+
+
+def random_board(rng, rows, cols, values=(2, 4, 8), density=1.0):
+    return [[rng.choice(values) if rng.random() < density else 0 for _ in range(cols)] for _ in range(rows)]
+
+
+def same(m1, m2):
+    return [(m.anchor, m.val, m.new_val, sorted(m.cells)) for m in m1] == \
+           [(m.anchor, m.val, m.new_val, sorted(m.cells)) for m in m2]
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_scan_matches_merge_scan(incremental):
+    rng = random.Random(2)
+    for t in range(3000):
+        rows, cols = rng.choice([(7, 5), (4, 4), (9, 6)])
+        b = random_board(rng, rows, cols, [2, 4, 8, 16] if t % 2 else [2, 4], rng.random())
+        b2 = [row[:] for row in b]
+        d = MergeDetector(rows, cols, incremental); d.touch_all()
+        assert same(merge_scan(b, rows, cols), d.scan(b2)), t
+        assert b == b2, t
+
+
+def test_incremental_passes_match_merge_scan():
+    """Drops and gravity touching only a few cells, pass after pass."""
+    from engine import gravity
+    rng = random.Random(5)
+    for t in range(300):
+        rows, cols = 7, 5
+        b = random_board(rng, rows, cols, [2, 4, 8], 0.5)
+        merge_scan(b, rows, cols); gravity(b, rows, cols)
+        while merge_scan(b, rows, cols): gravity(b, rows, cols)
+        ref = [row[:] for row in b]
+        d = MergeDetector(rows, cols)
+        for _ in range(20):
+            c = rng.randrange(cols)
+            r = max((r for r in range(rows) if b[r][c] == 0), default=-1)
+            if r < 0: break
+            v = rng.choice([2, 4, 8])
+            b[r][c] = ref[r][c] = v
+            d.touch(r, c)
+            while True:
+                m1, m2 = merge_scan(ref, rows, cols), d.scan(b)
+                assert same(m1, m2) and b == ref, t
+                if not m1: break
+                gravity(ref, rows, cols); d.touch_cells(gravity(b, rows, cols))
+
+
+class CountingRow(list):
+    """A board row that counts cell reads, a load-independent measure of work."""
+    reads = 0
+    def __getitem__(self, i):
+        CountingRow.reads += 1
+        return list.__getitem__(self, i)
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_full_pass_on_large_board_stays_linear(incremental):
+    rng = random.Random(1)
+    rows, cols = 128, 64
+    board = random_board(rng, rows, cols)
+    reads = {}
+    for name in ("scan", "detector"):
+        b = [CountingRow(row) for row in board]
+        d = MergeDetector(rows, cols, incremental); d.touch_all()
+        CountingRow.reads = 0
+        merges = merge_scan(b, rows, cols) if name == "scan" else d.scan(b)
+        reads[name] = CountingRow.reads
+        if name == "scan": ref, ref_merges = b, merges
+    assert b == ref and same(ref_merges, merges)
+    # A pass that rescans the board per group reads cells hundreds of times over here
+    assert reads["detector"] < 4*reads["scan"], reads
@@ -0,0 +1,104 @@
+"""Action logs, replays.dat and replaying recorded games."""
+import os
+import random
+import struct
+import zlib
+
+import pytest
+
+from actions import (ENTRY, MAGIC, DROP, SWAP, HAMMER, UNDO, REDO, ActionLog, Replay, append_replay,
+                     board_crc, decode, pack_replay, read_replays)
+from logfile import HEADER
+from replay import replay
+
+
+def test_varint_round_trip():
+    rng = random.Random(0)
+    moves = [(rng.randrange(5), rng.choice((0, 1, 15, 16, 127, 128, 16383, 16384, rng.randrange(1 << 40))))
+             for _ in range(2000)]
+    log = ActionLog()
+    for op, arg in moves: log.add(op, arg)
+    assert list(decode(bytes(log))) == moves and len(log) == len(moves)
+
+
+def test_small_moves_take_one_byte():
+    log = ActionLog()
+    for op, arg in ((DROP, 4), (SWAP, 0), (UNDO, 0), (REDO, 0), (HAMMER, 15)): log.add(op, arg)
+    assert len(bytes(log)) == 5
+    log.add(HAMMER, 16)
+    assert len(bytes(log)) == 7
+
+
+def games(n):
+    return [Replay(100*i, 1000 + i, i, 7, 5, i, bytes(range(i % 40)), (2, 4) if i % 3 == 0 else ()) for i in range(n)]
+
+
+def test_torn_entry_is_dropped_on_append(tmp_path):
+    path, reps = str(tmp_path / "replays.dat"), games(4)
+    for rep in reps[:3]: append_replay(path, rep)
+    with open(path, "ab") as f: f.write(pack_replay(reps[3])[:-3])
+    assert read_replays(path) == reps[:3]
+    append_replay(path, reps[3])
+    assert read_replays(path) == reps
+    assert os.path.getsize(path) == HEADER.size + sum(len(pack_replay(r)) for r in reps)
+
+
+def test_bad_crc_entries_are_skipped_and_kept(tmp_path):
+    path, reps = str(tmp_path / "replays.dat"), games(4)
+    for rep in reps[:3]: append_replay(path, rep)
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.seek(HEADER.size); f.write(b"\x7f")   # First entry's score
+        f.seek(size - 9); f.write(b"\x7f")      # Last entry's log
+    assert read_replays(path) == reps[1:2]
+    append_replay(path, reps[3])
+    assert read_replays(path) == [reps[1], reps[3]]
+    assert os.path.getsize(path) == size + len(pack_replay(reps[3]))
+
+
+def test_version_1_files_are_read_and_upgraded(tmp_path):
+    path, reps = str(tmp_path / "replays.dat"), games(3)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 1))
+        for rep in reps:
+            entry = pack_replay(rep)[:-8]
+            f.write(entry + struct.pack("<I", zlib.crc32(entry)))
+    assert read_replays(path) == reps
+    append_replay(path, reps[0])
+    assert read_replays(path) == reps + reps[:1]
+    with open(path, "rb") as f: assert HEADER.unpack(f.read(HEADER.size))[1] == 2
+
+
+def test_other_files_are_not_appended_to(tmp_path):
+    path = str(tmp_path / "replays.dat")
+    with open(path, "wb") as f: f.write(b"not a replay file at all")
+    with pytest.raises(ValueError): append_replay(path, games(1)[0])
+    with open(path, "rb") as f: assert f.read() == b"not a replay file at all"
+
+
+# --- the game ---
+
+@pytest.mark.parametrize("turbo", [False, True])
+def test_game_replays_to_recorded_score_and_board(tmp_path, monkeypatch, turbo):
+    pygame = pytest.importorskip("pygame")
+    import drop_merge_2048 as M
+    pygame.font.init()   # Merge and swap messages render text
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(M, "TURBO", turbo)
+    for seed in range(40):
+        G, rng = M.GamePro(), random.Random(seed)
+        G.reset(seed)
+        while not G.over and len(G.log) < 150:
+            a = rng.random()
+            if a < 0.05: G.action_swap()
+            elif a < 0.1: G.restore_state()
+            elif a < 0.13: G.redo_state()
+            elif a < 0.16: G.action_hammer(rng.randrange(G.rows), rng.randrange(G.cols))
+            else: G.action_drop(rng.randrange(G.cols))
+            for _ in range(rng.randrange(40)): G.update_logic(); G.fx.step()
+        G.end_game()
+    reps = read_replays(M.REPLAY_FILE)
+    assert len(reps) == 40
+    for rep in reps:
+        g = replay(rep)
+        assert (g.score, board_crc(g.board)) == (rep.score, rep.board_crc)
@@ -0,0 +1,74 @@
+"""The append-only score log: torn tails, bad records, compaction, migration."""
+import json
+import os
+
+from logfile import HEADER
+from scores import RECORD, HistoryManager, read_log
+
+
+def open_log(tmp_path, scores=(), top_k=50):
+    h = HistoryManager(str(tmp_path / "record.dat"), str(tmp_path / "history.json"), top_k)
+    for i, s in enumerate(scores): h.add_entry(s, ts=1000 + i)
+    return h
+
+
+def test_torn_final_record_is_truncated(tmp_path):
+    h = open_log(tmp_path, (30, 10, 20))
+    with open(h.filename, "ab") as f: f.write(RECORD.pack(99, 0, 0)[:7])
+    h = open_log(tmp_path)
+    assert (h.count, h.get_best(), h.skipped) == (3, 30, 0)
+    assert os.path.getsize(h.filename) == HEADER.size + 3*RECORD.size
+    h.add_entry(40, ts=2000)
+    assert read_log(h.filename)[0] == [(30, 1000), (10, 1001), (20, 1002), (40, 2000)]
+
+
+def test_bad_crc_record_is_skipped(tmp_path):
+    h = open_log(tmp_path, (30, 10, 20))
+    with open(h.filename, "r+b") as f:
+        f.seek(HEADER.size); f.write(RECORD.pack(31, 1000, 0)[:8])   # First score, old CRC
+    h = open_log(tmp_path)
+    assert (h.count, h.get_best(), h.skipped) == (2, 20, 1)
+    assert h.records() == [(10, 1001), (20, 1002)]
+
+
+def test_compact_drops_bad_records_and_keeps_top_and_recent(tmp_path):
+    h = open_log(tmp_path, range(1, 101))
+    with open(h.filename, "r+b") as f:
+        f.seek(HEADER.size + 5*RECORD.size); f.write(b"\xff")
+    h = open_log(tmp_path)
+    assert (h.count, h.skipped) == (99, 1)
+    h.compact()
+    assert (h.count, h.skipped) == (99, 0)
+    assert os.path.getsize(h.filename) == HEADER.size + 99*RECORD.size
+    h = open_log(tmp_path, top_k=3)
+    h.compact(keep=2)
+    assert h.records() == [(98, 1097), (99, 1098), (100, 1099)]
+
+
+def test_corrupt_header_is_set_aside_not_overwritten(tmp_path):
+    h = open_log(tmp_path, (30, 10, 20))
+    with open(h.filename, "r+b") as f: data = bytearray(f.read())
+    data[3] ^= 0xFF
+    with open(h.filename, "wb") as f: f.write(data)
+    h = open_log(tmp_path)
+    assert h.count == 0 and h.set_aside == h.filename + ".bad"
+    with open(h.set_aside, "rb") as f: assert f.read() == data
+    h.add_entry(5, ts=1)
+    assert h.records() == [(5, 1)]
+    assert open_log(tmp_path).set_aside is None
+
+
+def test_unsupported_version_is_set_aside(tmp_path):
+    h = open_log(tmp_path, (7,))
+    with open(h.filename, "r+b") as f: f.seek(8); f.write(b"\x09\x00")
+    h = open_log(tmp_path)
+    assert h.count == 0 and os.path.getsize(h.set_aside) == HEADER.size + RECORD.size
+
+
+def test_plain_best_score_and_history_json_are_migrated(tmp_path):
+    with open(tmp_path / "history.json", "w") as f:
+        json.dump([{"score": 120, "date": "2026-01-01 10:00"}, {"score": 0, "date": "2026-01-01 10:05"}], f)
+    with open(tmp_path / "record.dat", "w") as f: f.write("2048\n")
+    h = open_log(tmp_path)
+    assert h.set_aside is None
+    assert sorted(s for s, _ in h.records()) == [120, 2048]
@@ -0,0 +1,101 @@
+"""The JSON-lines protocol, driven through Server.handle."""
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+import server
+from server import Server
+
+
+def ask(srv, **msg):
+    return json.loads(srv.handle(json.dumps(msg).encode()))
+
+
+@pytest.fixture
+def game(tmp_path):
+    srv = Server(store=str(tmp_path))
+    sid = ask(srv, cmd="new", seed=7, rows=7, cols=5)["session"]
+    return srv, sid
+
+
+def test_drop_reports_changes(game):
+    srv, sid = game
+    out = ask(srv, cmd="drop", session=sid, col=2)
+    assert out["ok"] and out["moved"] and out["changes"]
+    assert ask(srv, cmd="state", session=sid)["moves"] == 1
+
+
+@pytest.mark.parametrize("move", [
+    {"cmd": "drop", "col": 5}, {"cmd": "drop", "col": 9}, {"cmd": "drop", "col": -1},
+    {"cmd": "hammer", "r": 7, "c": 0}, {"cmd": "hammer", "r": -1, "c": 0},
+    {"cmd": "hammer", "r": 0, "c": 5},
+])
+def test_off_board_moves_are_refused(game, move):
+    srv, sid = game
+    ask(srv, cmd="drop", session=sid, col=0)
+    before = ask(srv, cmd="state", session=sid)
+    out = ask(srv, session=sid, **move)
+    assert out == {"ok": False, "error": out["error"]} and "off the board" in out["error"]
+    assert ask(srv, cmd="state", session=sid) == before
+    assert srv.moves == 1
+
+
+@pytest.mark.parametrize("settings", [
+    {"spawn": [65536]}, {"spawn": [3]}, {"spawn": [2, 0]}, {"spawn": ["2"]}, {"spawn": [2]*256},
+    {"rows": 300}, {"rows": 0}, {"cols": 256}, {"seed": -1}, {"seed": 1 << 64},
+])
+def test_new_refuses_settings_a_session_cant_hold(tmp_path, settings):
+    srv = Server(store=str(tmp_path))
+    out = ask(srv, cmd="new", **settings)
+    assert out["ok"] is False and out["error"]
+    assert not srv.sessions
+
+
+def test_largest_settings_survive_eviction(tmp_path):
+    srv = Server(store=str(tmp_path), idle_s=0)
+    sid = ask(srv, cmd="new", seed=(1 << 64) - 1, rows=255, cols=255, spawn=[32768, 2])["session"]
+    for c in (0, 0, 254): assert ask(srv, cmd="drop", session=sid, col=c)["ok"]
+    before = ask(srv, cmd="state", session=sid)
+    assert srv.sweep() == 1 and not srv.sessions
+    assert ask(srv, cmd="state", session=sid) == before
+
+
+def test_sweep_async_evicts_and_reloads(tmp_path):
+    srv = Server(store=str(tmp_path), idle_s=0)
+    sids = [ask(srv, cmd="new", seed=i)["session"] for i in range(200)]
+    for sid in sids: ask(srv, cmd="drop", session=sid, col=1)
+    states = [ask(srv, cmd="state", session=sid) for sid in sids]
+    assert asyncio.run(srv.sweep_async()) == 200 and not srv.sessions
+    assert [ask(srv, cmd="state", session=sid) for sid in sids] == states
+
+
+def test_sessions_used_or_closed_while_written_keep_their_place(tmp_path, monkeypatch):
+    srv = Server(store=str(tmp_path), idle_s=0)
+    used, closed, idle = (ask(srv, cmd="new", seed=i)["session"] for i in range(3))
+    release, store = threading.Event(), server.store
+    def slow_store(path, rep):
+        release.wait(5); store(path, rep)
+    monkeypatch.setattr(server, "store", slow_store)
+    async def run():
+        sweep = asyncio.create_task(srv.sweep_async())
+        while not srv.evicting: await asyncio.sleep(0)
+        before = ask(srv, cmd="state", session=used)
+        ask(srv, cmd="close", session=closed)
+        release.set()
+        return await sweep, before
+    n, before = asyncio.run(run())
+    assert n == 1 and set(srv.sessions) == {used} and not srv.evicting
+    assert os.listdir(tmp_path) == [idle + ".rp"]
+    assert ask(srv, cmd="state", session=used) == before
+
+
+def test_failed_write_keeps_the_session(tmp_path, monkeypatch):
+    srv = Server(store=str(tmp_path), idle_s=0)
+    sid = ask(srv, cmd="new", seed=1)["session"]
+    def broken(path, rep): raise OSError("disk full")
+    monkeypatch.setattr(server, "store", broken)
+    assert asyncio.run(srv.sweep_async()) == 0
+    assert sid in srv.sessions and not srv.evicting
@@ -0,0 +1,19 @@
+"""Tournament games and the results file."""
+from tournament import CAPPED, RESULT, _chunk, play_game, read_results, run
+
+
+def test_no_drops_packs_an_empty_board():
+    r = play_game("random", 1, max_drops=0)
+    assert (r.drops, r.max_exp, r.cause) == (0, 0, CAPPED)
+    assert len(_chunk(("random", [1], 7, 5, (2, 4, 8), 0))) == RESULT.size
+
+
+def test_results_file_round_trip(tmp_path):
+    out = str(tmp_path / "results.dat")
+    run(["random", "lowest"], 5, out, jobs=1)
+    with open(out, "ab") as f: f.write(b"torn")
+    run(["random"], 3, out, seed=100, jobs=1)
+    results = read_results(out)
+    assert len(results) == 13
+    assert sorted(r.seed for r in results if r.strategy == "random") == [0, 1, 2, 3, 4, 100, 101, 102]
+    assert results[-1] == play_game("random", results[-1].seed)
@@ -0,0 +1,70 @@
+"""Undo snapshots, the history's depth and budget, and the undo/redo fees."""
+import pytest
+
+from bitboard import BitEngine
+from engine import Engine, UNDO_COST
+from undo import Snapshot, UndoHistory, pack_board, snapshot_size, unpack_board
+
+
+def test_pack_board_round_trip():
+    board = [[0, 2, 4], [1024, 0, 65536]]
+    assert unpack_board(pack_board(board), 2, 3) == board
+
+
+def snap(i): return Snapshot(bytes([i % 16])*35, i, 0, 2, 4)
+
+
+def test_depth_drops_oldest():
+    h = UndoHistory(depth=3)
+    for i in range(5): h.push(snap(i))
+    assert [st.score for st in h.past] == [2, 3, 4]
+    assert h.size == 3*snapshot_size(snap(0))
+
+
+def test_budget_drops_oldest():
+    per = snapshot_size(snap(0))
+    h = UndoHistory(budget=4*per + per//2)
+    for i in range(10): h.push(snap(i))
+    assert [st.score for st in h.past] == [6, 7, 8, 9]
+    assert h.size == 4*per
+    h.redo(h.undo(snap(10)))
+    assert h.size == 4*per
+
+
+def test_new_move_clears_redo():
+    h = UndoHistory()
+    h.push(snap(0)); h.push(snap(1))
+    assert h.undo(snap(2)).score == 1 and h.can_redo
+    h.push(snap(3))
+    assert not h.can_redo and [st.score for st in h.past] == [0, 3]
+
+
+@pytest.mark.parametrize("cls", [Engine, BitEngine])
+def test_undo_fee_stays_spent_after_redo(cls):
+    g = cls(seed=3)
+    g.gems = 20
+    g.drop(0); g.step()
+    after = (g.score, g.gems, [row[:] for row in g.board])
+    assert g.undo()
+    assert g.gems == 20 - UNDO_COST and g.score == 0 and not any(map(any, g.board))
+    assert g.redo()   # Free, but the undo's fee is not refunded
+    assert (g.score, g.gems, g.board) == (after[0], after[1] - UNDO_COST, after[2])
+    assert not g.redo()
+
+
+@pytest.mark.parametrize("cls", [Engine, BitEngine])
+def test_undo_needs_the_fee(cls):
+    g = cls(seed=3)
+    g.drop(0); g.step()
+    g.gems = UNDO_COST - 1
+    before = (g.score, g.gems, [row[:] for row in g.board], len(g.log))
+    assert not g.undo()
+    assert (g.score, g.gems, g.board, len(g.log)) == before
+
+
+@pytest.mark.parametrize("cls", [Engine, BitEngine])
+def test_undo_depth_caps_history(cls):
+    g = cls(seed=5, undo_depth=2)
+    g.gems = 100
+    for c in range(4): g.drop(c); g.step()
+    assert g.undo() and g.undo() and not g.undo()
@@ -0,0 +1,221 @@
+"""Strategy tournaments: many seeded games per strategy over every core.
+
+    python tournament.py                           # 10000 games of each strategy
+    python tournament.py -n 1000000 -s random -s greedy
+    python tournament.py --spawn 2,2,4,8 -s greedy # try another spawn mix
+    python tournament.py --report results.dat      # stats of a results file
+
+Every strategy plays the same seeds (base seed + game number), so their
+differences are not spawn luck. Games run in a multiprocessing Pool in
+chunks of CHUNK games; each finished chunk is appended to the results
+file as fixed records, in the order chunks finish rather than seed
+order, and folded into per-strategy means with 95% confidence intervals.
+A crash loses only the chunks still being played.
+
+results.dat, after logfile.py's header:
+
+    result   8s strategy, Q seed, q score, I drops, I gems earned,
+             B max tile exponent, B cause, 2x                     36 bytes
+"""
+import argparse
+import math
+import os
+import random
+import struct
+import sys
+import time
+from collections import Counter, namedtuple
+from multiprocessing import Pool
+
+from bitboard import BitEngine
+from engine import ROWS, COLS, SPAWN_VALUES, GEM_TILE
+from hint import LOSS, GEM_W, play, evaluate, searcher
+from logfile import HEADER, open_append, read_file, whole
+
+MAGIC = b"DM2048TR"
+VERSION = 1
+RESULT = struct.Struct("<8sQqIIBB2x")
+CHUNK = 256      # games per pool task
+MAX_DROPS = 5000
+
+TOPPED, CAPPED, OVERFLOW = range(3)
+CAUSES = ("topped", "capped", "overflow")   # check_loss, MAX_DROPS, tile past 4 bits
+
+Result = namedtuple("Result", "strategy seed score drops gems max_exp cause")
+
+STRATEGIES = {}   # name -> fn(engine, rng) returning a column, -1 if none
+DEFAULT = ("random", "lowest", "greedy", "search1")   # search2+ play long, slow games
+
+
+def strategy(name):
+    def reg(fn):
+        STRATEGIES[name] = fn
+        return fn
+    return reg
+
+
+def open_columns(g): return [c for c in range(g.cols) if g.landing_row(c) >= 0]
+
+
+@strategy("random")
+def _(g, rng):
+    cols = open_columns(g)
+    return rng.choice(cols) if cols else -1
+
+
+@strategy("lowest")
+def _(g, rng):
+    """Shortest column, leftmost on ties."""
+    return max(range(g.cols), key=lambda c: (g.landing_row(c), -c))
+
+
+@strategy("greedy")
+def _(g, rng):
+    """Most points from this drop's cascade, then most empty cells."""
+    best, col = LOSS*2, -1
+    for c in range(g.cols):
+        res = play(g.bits, g.L, c, g.curr)
+        if res is None: continue
+        bits, score, gems = res
+        v = LOSS if score == LOSS else score + GEM_W*gems + evaluate(bits, g.L)
+        if v > best: best, col = v, c
+    return col
+
+
+def _search(depth):
+    def move(g, rng):
+        """Expectimax to a fixed depth (no clock, so results are repeatable)."""
+        _, col, swap = searcher(g.rows, g.cols, g.spawn).best(g.bits, g.curr, g.next, g.gems, depth)
+        if swap: g.swap()
+        return col
+    return move
+
+
+for _d in (1, 2, 3):
+    strategy(f"search{_d}")(_search(_d))
+
+
+def play_game(name, seed, rows=ROWS, cols=COLS, spawn=SPAWN_VALUES, max_drops=MAX_DROPS):
+    """One game of strategy name. Returns its Result."""
+    g = BitEngine(rows, cols, seed=seed, undo_depth=0, spawn=spawn)
+    move, rng = STRATEGIES[name], random.Random(seed)
+    drops = gems = 0
+    cause = CAPPED
+    try:
+        while drops < max_drops:
+            col = move(g, rng)
+            if col < 0 or g.drop(col) < 0: cause = TOPPED; break
+            st = g.step()
+            drops += 1; gems += st.gems
+            if st.over: cause = TOPPED; break
+    except OverflowError: cause = OVERFLOW
+    return Result(name, seed, g.score, drops, gems, max(max(map(max, g.board)).bit_length()-1, 0), cause)   # 0 on an empty board
+
+
+def _chunk(args):
+    """Worker: packed Results for one run of seeds."""
+    name, seeds, rows, cols, spawn, max_drops = args
+    return b"".join(RESULT.pack(r.strategy.encode(), *r[1:])
+                    for r in (play_game(name, s, rows, cols, spawn, max_drops) for s in seeds))
+
+
+def read_results(path):
+    """Every whole Result in path. Raises ValueError if it isn't a results file."""
+    _, data = read_file(path, MAGIC, (VERSION,), "results file")
+    end = whole(len(data), HEADER.size, RESULT.size)
+    return [Result(name.rstrip(b"\0").decode(), *rest) for name, *rest in RESULT.iter_unpack(data[HEADER.size:end])]
+
+
+class Stats:
+    """Running sums for one strategy."""
+    def __init__(self):
+        self.n = 0
+        self.sums = Counter()   # field and field^2 totals
+        self.best = 0
+        self.tiles = Counter()  # max tile exponent -> games
+        self.causes = Counter()
+
+    def add(self, r):
+        self.n += 1
+        for k in ("score", "drops", "gems"):
+            v = getattr(r, k)
+            self.sums[k] += v; self.sums[k+"2"] += v*v
+        self.best = max(self.best, r.score)
+        self.tiles[r.max_exp] += 1
+        self.causes[CAUSES[r.cause]] += 1
+
+    def mean(self, k):
+        """(mean, 95% half-width) of field k."""
+        n = self.n
+        m = self.sums[k] / n
+        var = max(0.0, self.sums[k+"2"]/n - m*m) * n/(n-1) if n > 1 else 0.0
+        return m, 1.96*math.sqrt(var/n)
+
+    def reached(self, exp):
+        """(share of games whose max tile was at least 2**exp, 95% half-width)."""
+        p = sum(k for e, k in self.tiles.items() if e >= exp) / self.n
+        return p, 1.96*math.sqrt(p*(1-p)/self.n)
+
+
+def report(stats, out=sys.stdout):
+    gem = GEM_TILE.bit_length()-1
+    print(f"{'strategy':10} {'games':>9} {'score':>17} {'drops':>14} {'gems':>12} {f'>={GEM_TILE}':>14} {'best':>8}  causes", file=out)
+    for name, s in sorted(stats.items()):
+        (sm, sc), (dm, dc), (gm, gc), (pm, pc) = s.mean("score"), s.mean("drops"), s.mean("gems"), s.reached(gem)
+        causes = " ".join(f"{k} {v/s.n:.1%}" for k, v in s.causes.most_common())
+        print(f"{name:10} {s.n:9} {sm:9.1f} ±{sc:6.1f} {dm:7.1f} ±{dc:5.1f} {gm:6.2f} ±{gc:4.2f} "
+              f"{pm:7.2%} ±{pc:5.2%} {s.best:8}  {causes}", file=out)
+
+
+def tasks(names, games, seed, rows, cols, spawn, max_drops):
+    for start in range(0, games, CHUNK):
+        seeds = range(seed + start, seed + min(games, start + CHUNK))
+        for name in names: yield name, list(seeds), rows, cols, spawn, max_drops
+
+
+def run(names, games, out, seed=0, rows=ROWS, cols=COLS, spawn=SPAWN_VALUES, max_drops=MAX_DROPS, jobs=None):
+    """Play games seeds of each strategy, appending to out. Returns {name: Stats}."""
+    stats = {name: Stats() for name in names}
+    total, done, t0 = games*len(names), 0, time.perf_counter()
+    with open_append(out, MAGIC, VERSION, "results file", RESULT.size) as f, Pool(jobs) as pool:
+        for data in pool.imap_unordered(_chunk, tasks(names, games, seed, rows, cols, tuple(spawn), max_drops)):
+            f.write(data); f.flush()
+            for rec in RESULT.iter_unpack(data):
+                r = Result(rec[0].rstrip(b"\0").decode(), *rec[1:])
+                stats[r.strategy].add(r)
+            done += len(data) // RESULT.size
+            dt = time.perf_counter() - t0
+            print(f"\r{done}/{total} games, {done/max(dt, 1e-9):.0f}/s", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Play Drop Merge 2048 strategies against each other")
+    ap.add_argument("-s", "--strategy", action="append", choices=STRATEGIES, help=f"default: {', '.join(DEFAULT)}")
+    ap.add_argument("-n", "--games", type=int, default=10000, help="games per strategy")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: one per CPU)")
+    ap.add_argument("-o", "--out", default="results.dat", help="results file (appended to)")
+    ap.add_argument("--seed", type=int, default=0, help="seed of game 0")
+    ap.add_argument("--rows", type=int, default=ROWS)
+    ap.add_argument("--cols", type=int, default=COLS)
+    ap.add_argument("--spawn", default=",".join(map(str, SPAWN_VALUES)), help="tiles drops are picked from")
+    ap.add_argument("--max-drops", type=int, default=MAX_DROPS, help="stop a game after this many drops")
+    ap.add_argument("--report", metavar="PATH", help="print stats of a results file and exit")
+    args = ap.parse_args(argv)
+
+    if args.report:
+        stats = {}
+        for r in read_results(args.report): stats.setdefault(r.strategy, Stats()).add(r)
+        report(stats); return 0
+    names = args.strategy or list(DEFAULT)
+    spawn = [int(v) for v in args.spawn.split(",")]
+    t0 = time.perf_counter()
+    stats = run(names, args.games, args.out, args.seed, args.rows, args.cols, spawn, args.max_drops, args.jobs)
+    report(stats)
+    print(f"{sum(s.n for s in stats.values())} games in {time.perf_counter()-t0:.1f}s, results in {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
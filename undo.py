@@ -0,0 +1,75 @@
+"""Undo/redo history of immutable game snapshots.
+
+A Snapshot holds the board in packed form (bytes of tile exponents for the
+list engine, the int itself for BitEngine) plus the counters, so saving or
+restoring a position never copies nested lists and a saved snapshot can be
+handed out without defensive copies. History is a deque of past positions
+and a stack of undone ones; depth is unlimited unless capped, and the
+oldest positions are dropped once the estimated size passes the budget.
+"""
+import sys
+from collections import deque, namedtuple
+from itertools import chain
+
+Snapshot = namedtuple("Snapshot", "board score gems curr next")
+
+BUDGET = 64 << 20   # bytes
+_EXP = {0: 0, **{1 << e: e for e in range(1, 256)}}   # tile -> exponent byte
+
+
+def pack_board(board):
+    """Row-major bytes of tile exponents (0 = empty)."""
+    return bytes(map(_EXP.__getitem__, chain.from_iterable(board)))
+
+
+def unpack_board(data, rows, cols):
+    return [[1 << e if e else 0 for e in data[r*cols:(r+1)*cols]] for r in range(rows)]
+
+
+def snapshot_size(st):
+    return sys.getsizeof(st) + sys.getsizeof(st.board)
+
+
+class UndoHistory:
+    """Past positions (oldest first) and undone ones that redo can replay."""
+    def __init__(self, depth=None, budget=BUDGET):
+        self.depth = depth
+        self.budget = budget
+        self.past = deque()
+        self.future = []
+        self.size = 0
+
+    def __len__(self): return len(self.past)
+
+    @property
+    def can_undo(self): return bool(self.past)
+
+    @property
+    def can_redo(self): return bool(self.future)
+
+    def _add(self, st):
+        self.past.append(st)
+        self.size += snapshot_size(st)
+        while self.past and ((self.depth is not None and len(self.past) > self.depth) or self.size > self.budget):
+            self.size -= snapshot_size(self.past.popleft())
+
+    def push(self, st):
+        """Record the position before a move; a new move discards redo."""
+        self._add(st)
+        self.future.clear()
+
+    def undo(self, current):
+        """Most recent past position; current becomes redoable."""
+        st = self.past.pop()
+        self.size -= snapshot_size(st)
+        self.future.append(current)
+        return st
+
+    def redo(self, current):
+        st = self.future.pop()
+        self._add(current)
+        return st
+
+    def clear(self):
+        self.past.clear(); self.future.clear()
+        self.size = 0
@@ -0,0 +1,160 @@
+"""Render recorded games to raw video frames, headless and faster than real time.
+
+    python video.py                                    # best game in replays.dat to game.rgb0
+    python video.py -i 3 --stride 30 -o thumbs.rgb0    # game 3, two frames per second of play
+    python video.py --top 5 --pipe "ffmpeg -y -f rawvideo -pix_fmt {pix_fmt} -s {w}x{h} -r {fps} -i - reel.mp4"
+
+Games are played through GamePro and drawn by draw_ui, so frames show
+exactly what the window would (falls, merge waits, particles, messages),
+on an offscreen surface under SDL's dummy video driver. There is one sim
+step per frame at SIM_HZ, and --stride keeps every Nth frame; frames in
+between are simulated but never drawn.
+
+Frames are raw rgb0 (R, G, B, pad byte per pixel, rows top to bottom),
+written from the surface's own pixel buffer with no per-frame copy, to a
+file, stdout (-o -) or an encoder's stdin (--pipe, where {w} {h} {fps}
+{pix_fmt} are filled in). --rgb24 drops the pad byte at the cost of one
+copy per frame. Raw frames are big (1.4 MB each at 450x800), so pipe
+long reels into an encoder.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")   # Its banner would land in frames on stdout
+import pygame
+
+import drop_merge_2048 as M
+from actions import DROP, SWAP, HAMMER, UNDO, REDO, decode, board_crc, read_replays
+from engine import SPAWN_VALUES
+from particles import ParticlePool
+
+PAUSE = 6    # sim steps shown before each move
+HOLD = 120   # sim steps the final position stays on screen
+MASKS = (0xFF, 0xFF00, 0xFF0000, 0)   # R, G, B, pad in memory order on little-endian
+
+
+class NoHistory:
+    """Score history for a replay: the header's best is the running score, nothing is saved."""
+    scores = ()
+    def get_best(self): return 0
+    def add_entry(self, score, ts=None): pass
+
+
+class ReplayGame(M.GamePro):
+    """GamePro playing back rep's spawns, with particles seeded by them too so
+    a game renders the same frames every time. Ending the game saves nothing."""
+    hist_mgr = NoHistory()
+
+    def __init__(self, rep):
+        super().__init__()
+        self.fx.particles = ParticlePool(seed=rep.seed)
+        self.reset(rep.seed)
+
+    def end_game(self):
+        self.settle()
+        self.over = True
+        self.state = "OVER"
+
+    def busy(self):
+        return self.state in ("FALL", "MERGE_WAIT", "GRAVITY_WAIT") or self.view is not None
+
+    def act(self, op, arg):
+        """Play one logged move the way its key or click would."""
+        if op == DROP: self.action_drop(arg)
+        elif op == SWAP: self.action_swap()
+        elif op == HAMMER: self.action_hammer(arg // self.cols, arg % self.cols)
+        elif op == UNDO: self.restore_state()
+        elif op == REDO: self.redo_state()
+
+
+def play(rep, pause=PAUSE, hold=HOLD):
+    """Play rep on M.G, yielding after every sim step."""
+    G = M.G = ReplayGame(rep)
+    def step(): G.update_logic(); G.fx.step()
+    for op, arg in decode(rep.actions):
+        if G.over: break
+        for _ in range(pause): step(); yield
+        while G.busy(): step(); yield
+        G.act(op, arg)
+    while G.busy(): step(); yield
+    for _ in range(hold): step(); yield
+
+
+def setup(width, height):
+    """Offscreen screen surface, no window."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init(); pygame.font.init()
+    pygame.display.set_mode((1, 1))   # Icons convert_alpha() against the display format
+    M.screen = pygame.Surface((width, height), 0, 32, MASKS)
+    M.ASSETS.preload()
+
+
+def render(reps, out, size=(M.WIDTH, M.HEIGHT), stride=1, pause=PAUSE, hold=HOLD, rgb24=False):
+    """Write the frames of reps to out (a binary file). Returns frames written."""
+    frames = steps = 0
+    for rep in reps:
+        M.configure(rep.rows, rep.cols, *size, rep.spawn or SPAWN_VALUES)
+        for _ in play(rep, pause, hold):
+            steps += 1
+            if (steps - 1) % stride: continue
+            M.draw_ui()
+            if rgb24: out.write(pygame.image.tobytes(M.screen, "RGB"))
+            else:
+                view = M.screen.get_view("0")   # Locks the surface until released
+                out.write(view); del view
+            frames += 1
+        G = M.G
+        if G.score != rep.score or board_crc(G.board) != rep.board_crc:
+            print(f"warning: game with seed {rep.seed} replayed to {G.score}, recorded {rep.score}", file=sys.stderr)
+    return frames
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Render recorded Drop Merge 2048 games to raw video frames")
+    ap.add_argument("path", nargs="?", default="replays.dat")
+    ap.add_argument("-i", "--index", type=int, action="append", help="game to render (repeat for a reel; default: the best)")
+    ap.add_argument("--top", type=int, metavar="N", help="render the N best games as one reel")
+    ap.add_argument("-o", "--out", default="game.rgb0", help="raw frame file, - for stdout")
+    ap.add_argument("--pipe", metavar="CMD", help="shell command to stream frames into, e.g. an ffmpeg encode")
+    ap.add_argument("--stride", type=int, default=1, help="keep every Nth frame, e.g. 30 for thumbnails")
+    ap.add_argument("--size", default=f"{M.WIDTH}x{M.HEIGHT}", help="frame WxH")
+    ap.add_argument("--pause", type=int, default=PAUSE, help="sim steps before each move")
+    ap.add_argument("--hold", type=int, default=HOLD, help="sim steps on the final position")
+    ap.add_argument("--speed", type=float, default=M.SPEED, help="animation speed multiplier")
+    ap.add_argument("--turbo", action="store_true", help="play cascades back as turbo mode does")
+    ap.add_argument("--rgb24", action="store_true", help="3 bytes per pixel (one copy per frame)")
+    args = ap.parse_args(argv)
+    try: w, h = map(int, args.size.lower().split("x"))
+    except ValueError: ap.error("bad --size")
+    if args.stride < 1 or args.speed <= 0: ap.error("--stride and --speed must be positive")
+
+    reps = read_replays(args.path)
+    if not reps: ap.error(f"no games in {args.path}")
+    if args.index: picked = [reps[i] for i in args.index]
+    else: picked = sorted(reps, key=lambda r: -r.score)[:args.top or 1]
+    M.SPEED, M.TURBO = args.speed, args.turbo
+    setup(w, h)
+
+    fps, pix_fmt = M.SIM_HZ / args.stride, "rgb24" if args.rgb24 else "rgb0"
+    proc = None
+    if args.pipe:
+        proc = subprocess.Popen(args.pipe.format(w=w, h=h, fps=f"{fps:g}", pix_fmt=pix_fmt), shell=True, stdin=subprocess.PIPE)
+        out = proc.stdin
+    else: out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+    t0 = time.perf_counter()
+    try: n = render(picked, out, (w, h), args.stride, args.pause, args.hold, args.rgb24)
+    except BrokenPipeError: print("encoder closed its input", file=sys.stderr); return 1
+    finally:
+        try: out.close() if out is not sys.stdout.buffer else out.flush()
+        except BrokenPipeError: pass
+    dt = time.perf_counter() - t0
+    print(f"{n} frames ({w}x{h} {pix_fmt}, {n/fps:.1f}s at {fps:g} fps) of {len(picked)} games "
+          f"in {dt:.1f}s, {n/max(dt, 1e-9):.0f} frames/s", file=sys.stderr)
+    return proc.wait() if proc else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())